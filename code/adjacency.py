@@ -0,0 +1,39 @@
+import numpy as np
+from sampling import as_weight
+
+# A frozen snapshot of the bipartite compatibility graph, taken once when a simulation is built, so that the
+# simulation does not use networkx afterwards. The workers get dense slots (their order in the graph) and the
+# candidates of every task type are stored in CSR form: the candidate slots of task type number t (its position
+# in job_types) are slots[indptr[t]:indptr[t + 1]], in graph.neighbors order. Every edge also holds its service
+# rate (mu) and its probabilities in the PT and PS minimax solutions (x_PT, x_PS).
+
+
+class AdjacencySnapshot:
+    def __init__(self, graph, job_types, mu, x_values_PT, x_values_PS):
+        self.workers = [n for n, d in graph.nodes(data=True) if d['bipartite'] == 0]
+        self.slot = {worker: slot for slot, worker in enumerate(self.workers)}
+        self.job_types = list(job_types)
+        self.type_index = {job_type: t for t, job_type in enumerate(self.job_types)}
+        neighbors = [list(graph.neighbors(job_type)) for job_type in self.job_types]
+        self.indptr = np.cumsum([0] + [len(workers) for workers in neighbors])
+        self.slots = np.array([self.slot[worker] for workers in neighbors for worker in workers], dtype=int)
+        self.mu = np.array([mu[worker][job_type] for job_type, workers in zip(self.job_types, neighbors)
+                            for worker in workers], dtype=float)
+        self.x_PT = self.edge_values(neighbors, x_values_PT)
+        self.x_PS = self.edge_values(neighbors, x_values_PS)
+        # the same adjacency as lists, for the per-arrival lookups of the policies
+        self.candidate_slots = {job_type: self.slots[self.indptr[t]:self.indptr[t + 1]].tolist()
+                                for t, job_type in enumerate(self.job_types)}
+        self.candidate_workers = {job_type: workers for job_type, workers in zip(self.job_types, neighbors)}
+
+    # the values of a minimax solution (x[task][worker]) on the edges, as floats (None: no solution)
+    def edge_values(self, neighbors, x_values):
+        if x_values is None:
+            return None
+        return np.array([as_weight(x_values[job_type][worker]) for job_type, workers in zip(self.job_types, neighbors)
+                         for worker in workers], dtype=float)
+
+    # the values of a per-edge array for the candidates of a task type
+    def edges(self, values, job_type):
+        t = self.type_index[job_type]
+        return values[self.indptr[t]:self.indptr[t + 1]]
@@ -0,0 +1,58 @@
+import argparse
+import sys
+import main
+import run_minmax_problems
+import solvers
+
+# Regression check of the minimax solvers: the optima of PT and PS on graph_conf with the parameters of the
+# example output in the README (kappa 1, load 100000, the same lam for every task type), solved without the
+# solution cache, against the values recorded with Matlab. The linear program of PS has one optimum, the
+# solutions agree up to PS_TOLERANCE. fmincon stopped short of the optimum of PT, a solver may find a smaller
+# maximum waiting time (by up to PT_TOLERANCE), not a larger one.
+
+# recorded with Matlab (README): OPT(PT) and OPT(PS) as (maximum task waiting time, maximum worker utilization)
+RECORDED_PT = (1.8369723750863707, 0.6475113590322902)
+RECORDED_PS = (1.8369698150863727, 0.6475112302280328)
+PS_TOLERANCE = 1e-9  # relative
+PT_TOLERANCE = 1e-5  # relative
+
+
+# the failed checks of the solutions of a backend (name, see solvers.BACKENDS), an empty list when all pass
+def check(backend=None):
+    config, graph = main.make_config(1, 100000, [0.25, 0.25, 0.25, 0.25])
+    config['cache'] = False
+    config['solver'] = backend
+    xx1, pt1, ps1, xx2, pt2, ps2 = run_minmax_problems.get_probabilities_per_worker(config, graph)
+    pt1, ps1, pt2, ps2 = (float(value) for value in (pt1, ps1, pt2, ps2))
+    failures = []
+    if not RECORDED_PT[0] * (1 - PT_TOLERANCE) <= pt1 <= RECORDED_PT[0]:
+        failures.append("OPT(PT) maximum task waiting time {} (recorded: {})".format(pt1, RECORDED_PT[0]))
+    if abs(ps1 - RECORDED_PT[1]) > PT_TOLERANCE * RECORDED_PT[1]:
+        failures.append("OPT(PT) maximum worker utilization {} (recorded: {})".format(ps1, RECORDED_PT[1]))
+    for name, value, recorded in (("maximum task waiting time", pt2, RECORDED_PS[0]),
+                                  ("maximum worker utilization", ps2, RECORDED_PS[1])):
+        if abs(value - recorded) > PS_TOLERANCE * recorded:
+            failures.append("OPT(PS) {} {} (recorded: {})".format(name, value, recorded))
+    return failures
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Check the minimax solvers against the optima recorded with Matlab")
+    parser.add_argument("--solver", default=None, choices=list(solvers.BACKENDS),
+                        help="solver backend (default: {})".format(solvers.DEFAULT_BACKEND))
+    return parser.parse_args(argv)
+
+
+# run the check, exits with status 1 when it fails
+def run(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    failures = check(args.solver)
+    for failure in failures:
+        print("FAILED: " + failure)
+    if failures:
+        sys.exit(1)
+    print("OK: the optima of PT and PS match the recorded values")
+
+
+if __name__ == "__main__":
+    run()
@@ -1,4 +1,3 @@
-import copy
 import networkx as nx
 import run_minmax_problems
 import simulation
@@ -88,29 +87,42 @@ def load_graph():
         g.add_nodes_from(bot_nodes, bipartite=1)
         g.add_edges_from(edges)
 
-        return copy.deepcopy(g), top_nodes, bot_nodes
+        return g, top_nodes, bot_nodes
 
 
-# run the simulation itself and present its results.
-# first two lines allow to adjust the parameters.
-def run():
-    kappa, load, lam = 2, 120000, [0.25, 0.25, 0.25, 0.25]
-    config = {'total_duration': 604800, 'name': "\kappa-{},load-{},lam-{}".format(kappa, load, lam)}
+# the configuration of a simulation and the compatibility graph for the given parameters: kappa, the load
+# (requests per day), the arrival distribution (lam) and the simulation duration in seconds
+def make_config(kappa, load, lam, total_duration=604800):
+    config = {'total_duration': total_duration, 'name': "\kappa-{},load-{},lam-{}".format(kappa, load, lam)}
     graph, workers, tasks = load_graph()
     config['requests_per_day'] = load
     config['mu'] = generate_mu(workers, kappa, graph)
     config['lam'] = lam  # initial values of lam will be used for determining the actual values
-    lam = generate_lam(tasks, config)
-    config['lam'] = lam
+    config['lam'] = generate_lam(tasks, config)
+    return config, graph
+
+
+# the task types of a configuration (as simulation.JobType objects, by task type)
+def task_type_distributions(config):
+    job_type_distributions = {}
+    for taskid in range(len(config['lam'])):  # for each task define a relevant object
+        job_type_distributions[taskid + 1] = simulation.JobType(taskid + 1, config['lam'][taskid + 1])
+    return job_type_distributions
+
+
+# run the simulation itself and present its results.
+# first line allows to adjust the parameters.
+def run():
+    kappa, load, lam = 2, 120000, [0.25, 0.25, 0.25, 0.25]
+    config, graph = make_config(kappa, load, lam)
+    lam = config['lam']
 
     #run the minimax problems
     xx1, pt1, ps1, xx2, pt2, ps2 = run_minmax_problems.get_probabilities_per_worker(config, graph)
 
     # generate objects required for running the simulation
     # Define the job type distributions
-    job_type_distributions = {}
-    for taskid in range(len(config['lam'])):  # for each task define a relevant object
-        job_type_distributions[taskid + 1] = simulation.JobType(taskid + 1, config['lam'][taskid + 1])
+    job_type_distributions = task_type_distributions(config)
 
     job_types = {}
     for job_type, distribution in job_type_distributions.items():
@@ -125,7 +137,7 @@ def run():
     # Create the simulation object
     rasimulation = simulation.ResourceAllocationSimulation(config['total_duration'], job_type_distributions, graph,
                                                            xx1, xx2,
-                                                           copy.deepcopy(tasks), copy.deepcopy(total_tasks),
+                                                           tasks, total_tasks,
                                                            job_types, config['mu'])
 
     # Create resources and add them to simulation
@@ -161,4 +173,5 @@ def run():
     print("GWU Maximum task waiting time: {} Maximum worker utilization: {}".format(w, u))
 
 #run the simulation
-run()
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,129 @@
+import math
+
+# Online metrics of a policy run. The event engine records every assignment in a MetricsAccumulator, so a run
+# keeps O(task types x workers) totals instead of its tasks. The report (max_util, mx_waits) is the one of
+# simulation.generate_report; per task type and per worker breakdowns and waiting time quantiles come on top.
+
+# waiting time quantiles estimated by default
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+# streaming quantiles of non-negative values with a relative accuracy (a DDSketch): the values are counted in
+# logarithmic buckets, bucket k holding the values in (gamma^(k-1), gamma^k], so that the estimate of every
+# quantile is within accuracy (relative) of a value of the sequence. Sketches can be merged, memory grows with
+# the logarithm of the range of the values only.
+class QuantileSketch:
+    def __init__(self, accuracy=0.01, min_value=1e-9):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value  # smaller values count as zero
+        self.zeros = 0
+        self.count = 0
+        self.buckets = {}
+
+    def add(self, value):
+        self.count += 1
+        if value <= self.min_value:
+            self.zeros += 1
+        else:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    # add the values of another sketch (with the same accuracy)
+    def merge(self, other):
+        self.count += other.count
+        self.zeros += other.zeros
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+
+    # the estimate of the p-quantile (nan for an empty sketch)
+    def quantile(self, p):
+        if self.count == 0:
+            return math.nan
+        rank = p * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def values(self, quantiles=QUANTILES):
+        return {p: self.quantile(p) for p in quantiles}
+
+
+# The totals of a run: per task type and report worker the sums of the durations and waiting times and the
+# number of tasks (workers in the order they first appear), per worker its busy time, tasks and waiting time
+# and a waiting time sketch per task type (merged for all the tasks). The report worker of a task is the worker
+# key recorded by the policy (-1 when the policy does not record workers, then all the tasks of a type are one
+# group).
+class MetricsAccumulator:
+    def __init__(self, workers, quantiles=QUANTILES):
+        self.quantiles = quantiles
+        self.totals = {}
+        self.busy = dict.fromkeys(workers, 0)
+        self.worker_tasks = dict.fromkeys(workers, 0)
+        self.worker_waits = dict.fromkeys(workers, 0)
+        self.sketches = {}
+        self.current_time = 0
+
+    # a task of job_type assigned to resource (a worker name, None when it was not assigned)
+    def record(self, job_type, worker, resource, duration, wait_time):
+        workers = self.totals.get(job_type)
+        if workers is None:
+            workers = self.totals[job_type] = {}
+            self.sketches[job_type] = QuantileSketch()
+        totals = workers.get(worker)
+        if totals is None:
+            totals = workers[worker] = [0, 0, 0]
+        totals[0] += duration
+        totals[1] += wait_time
+        totals[2] += 1
+        if resource is not None:
+            self.busy[resource] += duration
+            self.worker_tasks[resource] += 1
+            self.worker_waits[resource] += wait_time
+        self.sketches[job_type].add(wait_time)
+
+    # the waiting time of a task type: the waiting time relative to the duration of every report worker,
+    # weighted by its share of the tasks
+    def type_wait(self, job_type):
+        workers = self.totals[job_type]
+        count = sum(totals[2] for totals in workers.values())
+        return sum([(wait / dur) * tasks / count for dur, wait, tasks in workers.values()])
+
+    # the maximum worker utilization and the maximum waiting time of a task type, as generate_report
+    def report(self, current_time):
+        self.current_time = current_time
+        max_util = max([busy / current_time for busy in self.busy.values()])
+        mx_waits = 0
+        for job_type in self.totals:
+            mx_waits = max(mx_waits, self.type_wait(job_type))
+        return max_util, mx_waits
+
+    # per task type: number of tasks, waiting time (as in the report), mean waiting time and quantiles
+    def by_type(self):
+        breakdown = {}
+        for job_type, workers in self.totals.items():
+            count = sum(totals[2] for totals in workers.values())
+            breakdown[job_type] = {'tasks': count, 'wait': self.type_wait(job_type),
+                                   'mean_wait': sum(totals[1] for totals in workers.values()) / count,
+                                   'quantiles': self.sketches[job_type].values(self.quantiles)}
+        return breakdown
+
+    # per worker: number of tasks, busy time, utilization (over the time of the last report) and mean waiting time
+    def by_worker(self):
+        return {worker: {'tasks': self.worker_tasks[worker], 'busy': busy,
+                         'utilization': busy / self.current_time if self.current_time else math.nan,
+                         'mean_wait': self.worker_waits[worker] / self.worker_tasks[worker]
+                         if self.worker_tasks[worker] else 0}
+                for worker, busy in self.busy.items()}
+
+    # the waiting time quantiles of all the tasks
+    def wait_quantiles(self):
+        sketch = QuantileSketch()
+        for type_sketch in self.sketches.values():
+            sketch.merge(type_sketch)
+        return sketch.values(self.quantiles)
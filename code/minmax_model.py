@@ -0,0 +1,102 @@
+import numpy as np
+from scipy import sparse
+
+# Vectorized assembly of the minimax programs of PT and PS.
+# Both programs share one indexing scheme: workers and tasks are numbered by their position in
+# EdgeModel.workers / EdgeModel.tasks and there is one x variable per edge of the compatibility graph,
+# ordered task major. The programs are returned in the problem format of the solver backends (see solvers.py).
+
+# version of the formulation of the programs, part of the key of the cached solutions (see solution_cache.py):
+# change it whenever the programs change
+FORMULATION = 1
+
+
+# the edges of the compatibility graph as arrays: worker index, task index, mu and lam of every edge
+class EdgeModel:
+    def __init__(self, graph, Mu, Lam):
+        self.workers = list({n for n, d in graph.nodes(data=True) if d['bipartite'] == 0})
+        self.tasks = list({n for n, d in graph.nodes(data=True) if d['bipartite'] == 1})
+        worker_index = {worker: cnt for cnt, worker in enumerate(self.workers)}
+        task_index = {task: cnt for cnt, task in enumerate(self.tasks)}
+        edges = [(worker_index[i], task_index[j]) if i in worker_index else (worker_index[j], task_index[i])
+                 for i, j in graph.edges()]
+        edges = np.array(edges, dtype=int).reshape(-1, 2)
+        order = np.lexsort((edges[:, 0], edges[:, 1]))  # task major
+        self.worker = edges[order, 0]
+        self.task = edges[order, 1]
+        self.mu = np.array([Mu[self.workers[i]][self.tasks[j]] for i, j in zip(self.worker, self.task)], dtype=float)
+        self.lam = np.array([Lam[task] for task in self.tasks], dtype=float)[self.task]
+        self.num_w = len(self.workers)
+        self.num_t = len(self.tasks)
+        self.num_e = len(self.worker)
+
+    # the x variable of every (worker, task) edge
+    def index(self):
+        return {(self.workers[i], self.tasks[j]): e for e, (i, j) in enumerate(zip(self.worker, self.task))}
+
+    # sum of the x variables of every task (one row per task)
+    def task_sums(self):
+        return sparse.csr_matrix((np.ones(self.num_e), (self.task, np.arange(self.num_e))),
+                                 shape=(self.num_t, self.num_e))
+
+    # sum_j x_ij * lam_j / mu_ij ** power per worker (one row per worker)
+    def worker_loads(self, power=1):
+        return sparse.csr_matrix((self.lam / self.mu ** power, (self.worker, np.arange(self.num_e))),
+                                 shape=(self.num_w, self.num_e))
+
+
+# variable bounds: 0 <= x <= 1 for the num_e x variables, the other variables are free
+def bounds(num_e, num_v):
+    lb = np.full(num_v, -np.inf)
+    ub = np.full(num_v, np.inf)
+    lb[:num_e] = 0
+    ub[:num_e] = 1
+    return lb, ub
+
+
+# the linear program of PS. variables: x (one per edge), rho (one per worker), all
+def ps_problem(model):
+    E, W = model.num_e, model.num_w
+    num_v = E + W + 1
+    identity = sparse.identity(W, format='csr')
+    loads = model.worker_loads()
+    # constraint 11: every task is assigned. constraint 12 (left): rho_i = sum_j x_ij * lam_j / mu_ij
+    Ae = sparse.vstack([
+        sparse.hstack([model.task_sums(), sparse.csr_matrix((model.num_t, W + 1))]),
+        sparse.hstack([loads, -identity, sparse.csr_matrix((W, 1))]),
+    ]).tocsr()
+    Be = np.concatenate([np.ones(model.num_t), np.zeros(W)])
+    # rho_i <= all, and constraint 12 (right): rho_i <= 1
+    A = sparse.vstack([
+        sparse.hstack([sparse.csr_matrix((W, E)), identity, -np.ones((W, 1))]),
+        sparse.hstack([loads, sparse.csr_matrix((W, W + 1))]),
+    ]).tocsr()
+    B = np.concatenate([np.zeros(W), np.ones(W)])
+    lb, ub = bounds(E, num_v)
+    return {'A': A, 'B': B, 'Ae': Ae, 'Be': Be, 'lb': lb, 'ub': ub,
+            'num_f': W, 'num_v': num_v, 'erows': Ae.shape[0], 'ierows': A.shape[0], 'all': num_v - 1}
+
+
+# the minimax program of PT. variables: x (one per edge), rho and rho^2 (one per worker), the waiting time
+# of every task and all. The waiting time constraints are non-linear and are added by the solver backends.
+def pt_problem(model):
+    E, W, T = model.num_e, model.num_w, model.num_t
+    num_v = E + 2 * W + T + 1
+    identity = sparse.identity(W, format='csr')
+    # constraint 7: every task is assigned. constraint 8 (left): rho_i and rho_i^2 of every worker
+    Ae = sparse.vstack([
+        sparse.hstack([model.task_sums(), sparse.csr_matrix((T, 2 * W + T + 1))]),
+        sparse.hstack([model.worker_loads(), -identity, sparse.csr_matrix((W, W + T + 1))]),
+        sparse.hstack([model.worker_loads(2), sparse.csr_matrix((W, W)), -identity, sparse.csr_matrix((W, T + 1))]),
+    ]).tocsr()
+    Be = np.concatenate([np.ones(T), np.zeros(2 * W)])
+    # constraint 9: the waiting time of every task is at most all. constraint 8 (right): rho_i <= 1
+    A = sparse.vstack([
+        sparse.hstack([sparse.csr_matrix((T, E + 2 * W)), sparse.identity(T), -np.ones((T, 1))]),
+        sparse.hstack([model.worker_loads(), sparse.csr_matrix((W, 2 * W + T + 1))]),
+    ]).tocsr()
+    B = np.concatenate([np.zeros(T), np.ones(W)])
+    lb, ub = bounds(E, num_v)
+    return {'A': A, 'B': B, 'Ae': Ae, 'Be': Be, 'lb': lb, 'ub': ub,
+            'Mu': model.mu, 'x_worker': model.worker, 'x_task': model.task,
+            'x_vars': E, 'end_sums': T, 'erows': Ae.shape[0], 'ierows': A.shape[0], 'nf': W, 'nv': num_v}
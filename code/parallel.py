@@ -0,0 +1,257 @@
+import argparse
+import csv
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+import main
+import run_minmax_problems
+import simulation
+from metrics import QUANTILES
+
+# Parallel runs of the policies: every job runs one policy (see simulation.POLICIES) with one seed on one
+# scenario, the jobs are spread over a process pool. The workload of every (scenario, seed) pair (the tasks and
+# the durations) is drawn once, in the parent, and placed in shared memory: the workers attach to it and run on
+# NumPy views of it, nothing but the names of the blocks is pickled. The results come back as a tidy table,
+# one row per job (see TABLE_COLUMNS).
+
+# the columns of the result table, the waiting time quantiles follow metrics.QUANTILES
+TABLE_COLUMNS = ['scenario', 'seed', 'policy', 'max_wait', 'max_util'] + \
+                ['wait_p{:g}'.format(100 * p) for p in QUANTILES] + ['tasks', 'seconds']
+
+
+# a simulation setup: the compatibility graph, a configuration (mu, lam and total_duration, as built by
+# main.make_config) and the PT and PS minimax solutions with their optimal values
+class Scenario:
+    def __init__(self, name, graph, config, x_values_PT, x_values_PS, opt_PT=None, opt_PS=None):
+        self.name = name
+        self.graph = graph
+        self.config = config
+        self.x_values_PT = x_values_PT
+        self.x_values_PS = x_values_PS
+        self.opt_PT = opt_PT  # (maximum task waiting time, maximum worker utilization) of PT
+        self.opt_PS = opt_PS
+
+
+# solve the minimax problems of a configuration, a scenario named after the configuration
+def solve_scenario(config, graph, session=None):
+    xx1, pt1, ps1, xx2, pt2, ps2 = run_minmax_problems.get_probabilities_per_worker(config, graph, session)
+    return Scenario(config['name'], graph, config, xx1, xx2, (pt1, ps1), (pt2, ps2))
+
+
+# the workload of a scenario for a seed: the tasks (a simulation.TaskTable) and the durations
+def generate_workload(scenario, seed):
+    np.random.seed(seed)
+    tasks, total_tasks = simulation.generate_tasks(main.task_type_distributions(scenario.config),
+                                                   scenario.config['total_duration'])
+    return tasks, simulation.generate_durations(scenario.config['mu'], total_tasks)
+
+
+# a workload in shared memory blocks: the columns of the task table and the durations as one matrix, a row per
+# (worker, task type) pair. spec() describes the blocks for attach_workload.
+class SharedWorkload:
+    def __init__(self, tasks, durations):
+        self.blocks = []
+        self.arrays = {}
+        self.pairs = [(i, j) for i in durations for j in durations[i]]
+        for key in ('arrival_time', 'job_type', 'number'):
+            self.allocate(key, getattr(tasks, key).shape, getattr(tasks, key).dtype)[:] = getattr(tasks, key)
+        matrix = self.allocate('durations', (len(self.pairs), len(tasks)), np.float64)
+        for row, (i, j) in enumerate(self.pairs):
+            matrix[row] = durations[i][j]
+
+    # an array in a new shared memory block
+    def allocate(self, key, shape, dtype):
+        dtype = np.dtype(dtype)
+        block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+        self.blocks.append(block)
+        self.arrays[key] = (block.name, tuple(shape), dtype.str)
+        return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def spec(self):
+        return {'arrays': self.arrays, 'pairs': self.pairs}
+
+    # free the blocks (once no job uses them any more)
+    def release(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+# attach to a shared workload: the blocks (to close after use), the task table and the durations (read only
+# views of the blocks)
+def attach_workload(spec):
+    blocks = []
+    arrays = {}
+    for key, (name, shape, dtype) in spec['arrays'].items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        arrays[key].flags.writeable = False
+    tasks = simulation.TaskTable(arrays['arrival_time'], arrays['job_type'], arrays['number'])
+    durations = {}
+    for row, (i, j) in enumerate(spec['pairs']):
+        durations.setdefault(i, {})[j] = arrays['durations'][row]
+    return blocks, tasks, durations
+
+
+# run one policy on a workload (tasks None: a streamed workload), a row of the result table. The random draws
+# of the policy are seeded from the seed (see simulation.ResourceAllocationSimulation.policy_random).
+def simulate_job(scenario, seed, policy, tasks, durations):
+    config = scenario.config
+    job_type_distributions = main.task_type_distributions(config)
+    job_types = {job_type: simulation.JobType(job_type, distribution.job_arrival_lambda)
+                 for job_type, distribution in job_type_distributions.items()}
+    rasimulation = simulation.ResourceAllocationSimulation(config['total_duration'], job_type_distributions,
+                                                           scenario.graph, scenario.x_values_PT,
+                                                           scenario.x_values_PS, tasks,
+                                                           None if tasks is None else len(tasks), job_types,
+                                                           config['mu'], seed, durations)
+    for worker in rasimulation.adjacency.workers:
+        rasimulation.add_resource(simulation.Resource(worker))
+
+    start = time.perf_counter()
+    u, w = rasimulation.run_policy(*rasimulation.policy(policy))
+    seconds = time.perf_counter() - start
+    metrics = rasimulation.metrics
+    quantiles = metrics.wait_quantiles()
+    row = {'scenario': scenario.name, 'seed': seed, 'policy': policy, 'max_wait': float(w), 'max_util': float(u)}
+    for p, column in zip(QUANTILES, TABLE_COLUMNS[5:]):
+        row[column] = float(quantiles[p])
+    row['tasks'] = sum(totals[2] for workers in metrics.totals.values() for totals in workers.values())
+    row['seconds'] = seconds
+    return row
+
+
+# a job of the pool: (scenario, seed, policy, spec of the shared workload or None to stream the workload)
+def run_job(job):
+    scenario, seed, policy, spec = job
+    if spec is None:
+        return simulate_job(scenario, seed, policy, None, None)
+    blocks, tasks, durations = attach_workload(spec)
+    try:
+        return simulate_job(scenario, seed, policy, tasks, durations)
+    finally:
+        del tasks, durations  # the views have to go before the blocks are closed
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:  # still referenced by the traceback of a failed run, unmapped with the process
+                pass
+
+
+# a process pool for the jobs. Its workers share the resource tracker of this process, so that the shared memory
+# blocks they attach to are only unlinked by their owner (see SharedWorkload.release), not when a worker exits.
+def process_pool(max_workers=None):
+    resource_tracker.ensure_running()
+    return ProcessPoolExecutor(max_workers)
+
+
+# a done callback of a job future: calls callback with the row of the job, unless it failed or was cancelled
+def completed(callback):
+    def done(future):
+        if not future.cancelled() and future.exception() is None:
+            callback(future.result())
+
+    return done
+
+
+# run every policy with every seed on every scenario over a pool of max_workers processes (default: one per
+# CPU), or over a given pool (see process_pool). Returns the result table, one row per job in (scenario, seed, policy) order.
+# The workloads of at most max_workloads (scenario, seed) pairs are in shared memory at a time, with stream
+# the workers draw their workloads themselves (see simulation.stream_tasks) and nothing is shared.
+# skip(scenario, seed, policy) leaves out the jobs it is true for (their rows are not returned) and
+# callback(row) is called with the row of every job as soon as it completes (from another thread).
+def run_jobs(scenarios, policies=simulation.POLICIES, seeds=(0,), max_workers=None, max_workloads=2,
+             stream=False, pool=None, skip=None, callback=None):
+    for policy in policies:
+        if policy not in simulation.POLICIES:
+            raise ValueError("Unknown policy: {} (available: {})".format(policy, ", ".join(simulation.POLICIES)))
+    if pool is None:
+        with process_pool(max_workers) as pool:
+            return run_jobs(scenarios, policies, seeds, max_workloads=max_workloads, stream=stream, pool=pool,
+                            skip=skip, callback=callback)
+
+    futures = []
+    pending = deque()  # the shared workloads with the futures of their jobs
+    try:
+        for scenario in scenarios:
+            for seed in seeds:
+                todo = [policy for policy in policies if skip is None or not skip(scenario, seed, policy)]
+                if not todo:
+                    continue
+                spec = None
+                if not stream:
+                    while len(pending) >= max_workloads:
+                        workload, jobs = pending.popleft()
+                        for future in jobs:
+                            future.exception()  # wait for the job
+                        workload.release()
+                    workload = SharedWorkload(*generate_workload(scenario, seed))
+                    pending.append((workload, []))
+                    spec = workload.spec()
+                for policy in todo:
+                    future = pool.submit(run_job, (scenario, seed, policy, spec))
+                    if callback is not None:
+                        future.add_done_callback(completed(callback))
+                    futures.append(future)
+                    if spec is not None:
+                        pending[-1][1].append(future)
+        rows = [future.result() for future in futures]
+    finally:
+        for workload, jobs in pending:
+            for future in jobs:
+                future.cancel() or future.exception()  # the blocks stay until the running jobs are done
+            workload.release()
+    return rows
+
+
+# write the result table as a csv file
+def write_csv(rows, path, columns=TABLE_COLUMNS):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# the result table as aligned text
+def format_table(rows, columns=TABLE_COLUMNS):
+    cells = [columns] + [['{:.6g}'.format(row[column]) if isinstance(row[column], float)
+                          else str(row[column]) for column in columns] for row in rows]
+    widths = [max(len(line[k]) for line in cells) for k in range(len(columns))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in cells)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run the policies and their replications over a process pool")
+    parser.add_argument("--kappa", type=float, default=2)
+    parser.add_argument("--load", type=float, default=120000, help="requests per day")
+    parser.add_argument("--lam", type=float, nargs="+", default=[0.25, 0.25, 0.25, 0.25],
+                        help="arrival distribution over the task types")
+    parser.add_argument("--duration", type=int, default=604800, help="simulation duration in seconds")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--policies", nargs="+", default=list(simulation.POLICIES), choices=simulation.POLICIES)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: one per CPU)")
+    parser.add_argument("--stream", action="store_true", help="draw the workloads in the workers")
+    parser.add_argument("--csv", help="write the result table to this file")
+    return parser.parse_args(argv)
+
+
+# run the policies of main.py (same parameters by default) in parallel and print the result table
+def run(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    config, graph = main.make_config(args.kappa, args.load, args.lam, args.duration)
+    scenario = solve_scenario(config, graph)
+    print("OPT(PT) Maximum task waiting time: {} Maximum worker utilization: {}".format(*scenario.opt_PT))
+    print("OPT(PS) Maximum task waiting time: {} Maximum worker utilization: {}".format(*scenario.opt_PS))
+    rows = run_jobs([scenario], args.policies, args.seeds, args.workers, stream=args.stream)
+    print(format_table(rows))
+    if args.csv:
+        write_csv(rows, args.csv)
+
+
+if __name__ == "__main__":
+    run()
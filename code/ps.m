@@ -1,35 +1,35 @@
-function [x,fval] = ps()
-
-fname = 'mnmxfair1';
-filename = strcat(strcat('temp/fa_', fname), '.csv');
-data = readmatrix(filename, 'HeaderLines', 1);
+function [x,fval,iterations] = ps(p)
+% p: the problem, either a struct passed by the python wrapper or the path of a .mat file holding it.
+% fields: I, J, V, B (inequality rows), Ie, Je, Ve, Be (equality rows, 0-based indices), lb, ub (variable bounds),
+% num_f, num_v, erows, ierows, all
+% iterations: the number of iterations of the solve
+
+if ischar(p) || isstring(p)
+    p = load(p);
+end
 
 % Extract parameters
-nf = data(1);
-nv = data(2);
-erows = data(3);
-ierows = data(4);
-all = data(5);
-
-% read objective and constraints
-val = csvread(strcat(strcat('temp/vals_', fname), '.csv'));
-I = csvread(strcat(strcat('temp/I_', fname), '.csv'))+1;
-J = csvread(strcat(strcat('temp/J_', fname), '.csv'))+1;
-b = csvread(strcat(strcat('temp/b_', fname), '.csv'));
-A = sparse(I,J, val, ierows,nv);
-
-vale = csvread(strcat(strcat('temp/valse_', fname), '.csv'));
-Ie = csvread(strcat(strcat('temp/Ie_', fname), '.csv'))+1;
-Je = csvread(strcat(strcat('temp/Je_', fname), '.csv'))+1;
-be = csvread(strcat(strcat('temp/be_', fname), '.csv'));
-Ae = sparse(Ie,Je, vale, erows,nv);
+nv = double(p.num_v);
+erows = double(p.erows);
+ierows = double(p.ierows);
+all = double(p.all);
+
+% build objective and constraints
+A = sparse(double(p.I(:))+1, double(p.J(:))+1, double(p.V(:)), ierows, nv);
+b = double(p.B(:));
+
+Ae = sparse(double(p.Ie(:))+1, double(p.Je(:))+1, double(p.Ve(:)), erows, nv);
+be = double(p.Be(:));
+lb = double(p.lb(:));
+ub = double(p.ub(:));
 c = zeros(1, nv);
 c(all+1) = 1;
 
 options = optimoptions(@linprog,'Display', 'iter');
 
 %run linear program
-[x, fval] = linprog(c,A,b,Ae,be,[],[], options);
+[x, fval, ~, output] = linprog(c,A,b,Ae,be,lb,ub, options);
+iterations = output.iterations;
 
 end
 
@@ -1,73 +1,87 @@
 
 
-function [x,fval] = pt()
-    fname='mnmxfair1';
-    filename = strcat(strcat('temp/fa_', fname), '.csv');
-    data = readmatrix(filename, 'HeaderLines', 1);
-    
+function [x,fval,iterations] = pt(p)
+    % p: the problem, either a struct passed by the python wrapper or the path of a .mat file holding it.
+    % fields: I, J, V, B (inequality rows), Ie, Je, Ve, Be (equality rows, 0-based indices), lb, ub (variable
+    % bounds), Mu, x_worker, x_task, x_vars, end_sums, erows, ierows, nf, nv and optionally x0 (a warm start
+    % for all the variables)
+    % iterations: the number of iterations of the solve
+    if ischar(p) || isstring(p)
+        p = load(p);
+    end
+
     % Extract parameters
-    xvars = data(1);
-    end_sums = data(2);
-    erows = data(3);
-    ierows = data(4);
-    nf = data(5);
-    nv = data(6);
+    xvars = double(p.x_vars);
+    end_sums = double(p.end_sums);
+    erows = double(p.erows);
+    ierows = double(p.ierows);
+    nf = double(p.nf);
+    nv = double(p.nv);
+
+    % build constraints
+    A = sparse(double(p.I(:))+1, double(p.J(:))+1, double(p.V(:)), ierows, nv);
+    b = double(p.B(:));
 
-    % read constraints
-    val = csvread(strcat(strcat('temp/vals_', fname), '.csv'));
-    I = csvread(strcat(strcat('temp/I_', fname), '.csv'))+1;
-    J = csvread(strcat(strcat('temp/J_', fname), '.csv'))+1;
-    b = csvread(strcat(strcat('temp/b_', fname), '.csv'));
-    A = sparse(I,J, val, ierows,nv);
-    
-    vale = csvread(strcat(strcat('temp/valse_', fname), '.csv'));
-    Ie = csvread(strcat(strcat('temp/Ie_', fname), '.csv'))+1;
-    Je = csvread(strcat(strcat('temp/Je_', fname), '.csv'))+1;
-    be = csvread(strcat(strcat('temp/be_', fname), '.csv'));
-    Ae = sparse(Ie,Je, vale, erows,nv);
-    mu = csvread(strcat(strcat('temp/Mu_', fname), '.csv'));
+    Ae = sparse(double(p.Ie(:))+1, double(p.Je(:))+1, double(p.Ve(:)), erows, nv);
+    be = double(p.Be(:));
+    mu = double(p.Mu(:));
+    xworker = double(p.x_worker(:)); % worker position of every x variable (0-based)
+    lb = double(p.lb(:));
+    ub = double(p.ub(:));
 
-    x0 = zeros(size(A, 2),1);
+    if isfield(p, 'x0')
+        x0 = double(p.x0(:));
+    else
+        x0 = zeros(size(A, 2),1);
+    end
+    % index maps of the waiting time terms x_ij * mu_ij * rho2_i / (1 - rho_i), one per x variable (edge) in the
+    % variable order of the problem, computed once for all the evaluations of the constraints
+    maps.edges = (1:xvars)';
+    maps.task = double(p.x_task(:)) + 1; % task of every x variable (1-based)
+    maps.rho = xvars + xworker + 1;
+    maps.rho2 = xvars + nf + xworker + 1;
+    maps.waits = xvars + 2*nf + (1:end_sums)';
+    maps.mu = mu;
+    maps.sums = sparse(maps.task, maps.edges, 1, end_sums, xvars); % sums the terms of every task
+    maps.nv = nv;
+    maps.end_sums = end_sums;
+    % the gradients of the waiting time of every task minus all (constant)
+    maps.gc = sparse([maps.waits; nv * ones(end_sums, 1)], [(1:end_sums)'; (1:end_sums)'], ...
+        [ones(end_sums, 1); -ones(end_sums, 1)], nv, end_sums);
     % generate non linear constraints from data
-    handle = @(x) getNonLinearConstraints(x,mu, Ae(1:end_sums,:), xvars,nf);
+    handle = @(x) getNonLinearConstraints(x, maps);
 
-    options = optimoptions(@fmincon,'Display', 'iter','MaxFunEvals',1000000, 'MaxIterations', 1000000, 'StepTolerance',1e-20);
+    options = optimoptions(@fmincon,'Display', 'iter','MaxFunEvals',1000000, 'MaxIterations', 1000000, 'StepTolerance',1e-20, ...
+        'SpecifyObjectiveGradient', true, 'SpecifyConstraintGradient', true);
 
     %run optimizer for the non-linear program
-    [x, fval] = fmincon(@getLastElement,x0, A,b,Ae,be,[],[],handle, options);
+    [x, fval, ~, output] = fmincon(@getLastElement,x0, A,b,Ae,be,lb,ub,handle, options);
+    iterations = output.iterations;
 
 end
 
-function lastElement = getLastElement(vector)
-    % Get the last element of the vector
+function [lastElement, gradient] = getLastElement(vector)
+    % Get the last element of the vector (and its gradient)
     lastElement = vector(length(vector));
+    if nargout > 1
+        gradient = zeros(length(vector), 1);
+        gradient(end) = 1;
+    end
 end
 
-% generate non linear constraints
-function [c, ce] = getNonLinearConstraints(x,mu, Ae, xvars, nf)
-    [numRows, ~] = size(Ae);
-    
-    c = [];
-    ce = [];
-    rcols = xvars / numRows;
-
-    for row = 1:numRows
-        rowIndex = row;
-        
-        nonZeroIndices = find(Ae(rowIndex, :)); %available workers
-
-        su = 0;
-
-        for i = 1:length(nonZeroIndices)
-            value = nonZeroIndices(i);
-            ind = xvars+value - (row-1)*rcols;
-            ind2 = xvars + nf + value - (row-1)*rcols;
-            su = su + x(value) * mu(value) * x(ind2)/(1-x(ind));
-        end
-        su = su - x(xvars+rcols*2+row);
-        su2 = x(xvars+rcols*2+row)-x(length(x));
-
-        c = [c,su2];
-        ce = [ce, su];
+% generate non linear constraints: the waiting time of every task is the sum of its terms (ce) and at most all
+% (c), with their gradients (one column per constraint)
+function [c, ce, gc, gce] = getNonLinearConstraints(x, maps)
+    free = 1 ./ (1 - x(maps.rho));
+    d_x = maps.mu .* x(maps.rho2) .* free; % derivative of every term by its x variable
+    ce = maps.sums * (x(maps.edges) .* d_x) - x(maps.waits);
+    c = x(maps.waits) - x(maps.nv);
+    if nargout > 2
+        gc = maps.gc;
+        d_rho2 = x(maps.edges) .* maps.mu .* free;
+        d_rho = d_rho2 .* x(maps.rho2) .* free;
+        gce = sparse([maps.edges; maps.rho2; maps.rho; maps.waits], ...
+            [maps.task; maps.task; maps.task; (1:maps.end_sums)'], ...
+            [d_x; d_rho2; d_rho; -ones(maps.end_sums, 1)], maps.nv, maps.end_sums);
     end
 end
@@ -0,0 +1,95 @@
+import numpy as np
+from scipy import sparse
+import minmax_model
+from sampling import as_weight
+
+# Analytic queueing metrics of assignments, the expressions of the minimax programs (see minmax_model.py)
+# evaluated without solving or simulating. An assignment holds the probability x_ij that a task of type j goes
+# to worker i (one value per edge of the compatibility graph). Worker i is utilized
+#     rho_i = sum_j x_ij * lam_j / mu_ij
+# and a task of type j waits on average
+#     W_j = sum_i x_ij * mu_ij * (sum_j' x_ij' * lam_j' / mu_ij' ** 2) / (1 - rho_i)
+# (infinite when it may go to a worker with rho_i >= 1). The PS objective is the maximum utilization, the PT
+# objective the maximum waiting time.
+# Assignments are evaluated in batches: any leading dimensions of the input are kept in the results.
+
+
+class QueueingModel:
+    # the edges: worker and task index, service rate (mu) and arrival rate of the task (lam) of every edge
+    def __init__(self, worker, task, mu, lam, num_w, num_t, workers=None, tasks=None):
+        self.worker = np.asarray(worker, dtype=int)
+        self.task = np.asarray(task, dtype=int)
+        self.mu = np.asarray(mu, dtype=float)
+        self.num_w = num_w
+        self.num_t = num_t
+        self.num_e = len(self.worker)
+        self.workers = workers  # worker and task names by index, for assignments given as xx[task][worker]
+        self.tasks = tasks
+        edges = np.arange(self.num_e)
+        lam = np.asarray(lam, dtype=float)
+        # rho and the second moment sums per worker, waiting times per task: (rows x edges) @ x
+        self.loads = sparse.csr_matrix((lam / self.mu, (self.worker, edges)), shape=(num_w, self.num_e))
+        self.second_moments = sparse.csr_matrix((lam / self.mu ** 2, (self.worker, edges)),
+                                                shape=(num_w, self.num_e))
+        self.task_sums = sparse.csr_matrix((np.ones(self.num_e), (self.task, edges)), shape=(num_t, self.num_e))
+
+    # the values of assignments on the edges, an array (..., edges). Assignments are given as
+    # - arrays of (task, worker) matrices (..., tasks, workers), the values off the edges are ignored
+    # - a scipy sparse (task, worker) matrix
+    # - arrays of edge values (..., edges), in the order of the edges of the model
+    # - a solution xx[task][worker] as returned by run_PT / run_PS (for models with names)
+    def edge_values(self, x):
+        if sparse.issparse(x):
+            return np.asarray(x.tocsr()[self.task, self.worker], dtype=float).reshape(-1)
+        if isinstance(x, dict):
+            return np.array([as_weight(x[self.tasks[j]][self.workers[i]]) for i, j in zip(self.worker, self.task)])
+        x = np.asarray(x, dtype=float)
+        if x.ndim >= 2 and x.shape[-2:] == (self.num_t, self.num_w):
+            return x[..., self.task, self.worker]
+        if x.shape[-1:] == (self.num_e,):
+            return x
+        raise ValueError("Assignments of shape {} match neither ({} tasks, {} workers) matrices nor {} edges".format(
+            x.shape, self.num_t, self.num_w, self.num_e))
+
+    # the metrics of assignments (see edge_values), a dict of arrays with the leading dimensions of x:
+    # utilization (..., workers), waits (..., tasks), PS and PT (the objectives, ...)
+    def evaluate(self, x):
+        x = self.edge_values(x)
+        shape = x.shape[:-1]
+        x = x.reshape(-1, self.num_e).T  # one assignment per column
+        rho = (self.loads @ x).T
+        second_moments = (self.second_moments @ x).T
+        stable = rho < 1
+        factor = np.divide(second_moments, 1 - rho, out=np.full(rho.shape, np.inf), where=stable)
+        terms = x.T * self.mu * factor[:, self.worker]
+        terms[x.T == 0] = 0  # no share of an unstable worker
+        waits = (self.task_sums @ terms.T).T
+        return {'utilization': rho.reshape(shape + (self.num_w,)), 'waits': waits.reshape(shape + (self.num_t,)),
+                'PS': rho.max(axis=1, initial=0).reshape(shape), 'PT': waits.max(axis=1, initial=0).reshape(shape)}
+
+
+# the model of the edges of a minmax_model.EdgeModel (same order of the workers, the tasks and the edges)
+def edge_model(model):
+    return QueueingModel(model.worker, model.task, model.mu, model.lam, model.num_w, model.num_t, model.workers,
+                         model.tasks)
+
+
+# the model of a compatibility graph with service rates Mu[worker][task] and arrival rates Lam[task]
+def graph_model(graph, Mu, Lam):
+    return edge_model(minmax_model.EdgeModel(graph, Mu, Lam))
+
+
+# the model of service rates given as a (task, worker) matrix, dense or sparse (the edges are its non-zero
+# entries), and arrival rates lam (one per task)
+def matrix_model(mu, lam):
+    mu = sparse.coo_matrix(mu)
+    order = np.lexsort((mu.col, mu.row))  # task major, as minmax_model.EdgeModel
+    task, worker, rate = mu.row[order], mu.col[order], mu.data[order]
+    keep = rate > 0
+    num_t, num_w = mu.shape
+    return QueueingModel(worker[keep], task[keep], rate[keep], np.asarray(lam, dtype=float)[task[keep]], num_w, num_t)
+
+
+# the metrics of assignments on a compatibility graph (see QueueingModel.evaluate)
+def evaluate(x, graph, Mu, Lam):
+    return graph_model(graph, Mu, Lam).evaluate(x)
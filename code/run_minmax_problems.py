@@ -1,11 +1,169 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import networkx as nx
+import minmax_model
 import run_PS
 import run_PT
+import solution_cache
+import solvers
 
+# The minimax programs of a compatibility graph with several connected components (e.g. regional pools of
+# workers) are solved per component: the components share no variable and the objectives are maxima over the
+# workers and the tasks, so the optimum of the whole graph is the maximum of the optima of the components.
+# The components are solved concurrently in a process pool (see solve_components) and their solutions merged.
 
-def get_probabilities_per_worker(config, graph):
-    Mu = config['mu']
-    Lam = config['lam']
-    xx1, pt1, ps1 = run_PT.get_probabilities_per_worker(graph, Mu, Lam)
-    xx2, pt2, ps2 = run_PS.get_probabilities_per_worker(graph, Mu, Lam)
+# graphs with fewer edges have their components solved in this process: starting the processes takes longer
+PARALLEL_MIN_EDGES = 100
 
-    return xx1, pt1, ps1, xx2, pt2, ps2
+
+# both programs run on the same solver session: the given one, or the shared session of config['solver'].
+# The solutions are looked up in the solution cache first (see solution_cache.py): the given one, or the cache
+# of config['cache'] (a directory, default: the default cache, False: no cache).
+# The components of the graph are solved in up to max_workers processes (see solve_components).
+def get_probabilities_per_worker(config, graph, session=None, cache=None, max_workers=None):
+    backend = config.get('solver') if session is None else session
+    session, cache, key, solutions = cached_solutions(config, graph, session, cache)
+    if solutions is not None:
+        return solutions
+    parts = components(graph)
+    if len(parts) > 1:
+        solutions = merge_solutions(graph, config, [part_solutions[0] for part_solutions in
+                                                    solve_components(component_solutions, [config], parts,
+                                                                     backend, max_workers)])
+    else:
+        Mu = config['mu']
+        Lam = config['lam']
+        xx1, pt1, ps1 = run_PT.get_probabilities_per_worker(graph, Mu, Lam, session)
+        xx2, pt2, ps2 = run_PS.get_probabilities_per_worker(graph, Mu, Lam, session)
+        solutions = (xx1, pt1, ps1, xx2, pt2, ps2)
+    if cache is not None:
+        cache.put(key, solutions)
+
+    return solutions
+
+
+# solve the minimax problems of a sequence of configurations on the same graph (a path, e.g. growing loads) in
+# order, every solve warm started from the previous one: PT from its solution (the solvers.PTStart of the
+# native backend) and PS from its basis (with highspy, see solvers.py). Returns the solutions of every
+# configuration (as get_probabilities_per_worker) and the number of iterations of its solves ({'PT': n,
+# 'PS': n}, None for the solutions found in the cache).
+# The components of the graph are solved as paths of their own, in up to max_workers processes.
+def solve_path(configs, graph, session=None, cache=None, max_workers=None):
+    parts = components(graph)
+    if len(parts) > 1:
+        return solve_component_paths(configs, graph, parts, session, cache, max_workers)
+    solutions = []
+    iterations = []
+    x0 = basis = None
+    for config in configs:
+        session, cache, key, solution = cached_solutions(config, graph, session, cache)
+        if solution is not None:
+            solutions.append(solution)
+            iterations.append(None)
+            x0 = solution[0]
+            continue
+        Mu = config['mu']
+        Lam = config['lam']
+        pt_info, ps_info = {}, {}
+        xx1, pt1, ps1 = run_PT.get_probabilities_per_worker(graph, Mu, Lam, session, x0, pt_info)
+        xx2, pt2, ps2 = run_PS.get_probabilities_per_worker(graph, Mu, Lam, session, basis, ps_info)
+        solution = (xx1, pt1, ps1, xx2, pt2, ps2)
+        if cache is not None:
+            cache.put(key, solution)
+        solutions.append(solution)
+        iterations.append({'PT': pt_info.get('iterations'), 'PS': ps_info.get('iterations')})
+        x0, basis = pt_info.get('start', xx1), ps_info.get('basis')
+
+    return solutions, iterations
+
+
+# solve_path for a graph with several components: the configurations that are not cached are solved as a path
+# per component, the iterations of a step are summed over the components
+def solve_component_paths(configs, graph, parts, session=None, cache=None, max_workers=None):
+    backend = configs[0].get('solver') if session is None else session
+    solutions = []
+    keys = []
+    for config in configs:
+        session, cache, key, solution = cached_solutions(config, graph, session, cache)
+        solutions.append(solution)
+        keys.append(key)
+    iterations = [None] * len(configs)
+    todo = [step for step, solution in enumerate(solutions) if solution is None]
+    if todo:
+        paths = solve_components(component_path, [configs[step] for step in todo], parts, backend, max_workers)
+        for position, step in enumerate(todo):
+            solutions[step] = merge_solutions(graph, configs[step],
+                                              [part_solutions[position] for part_solutions, _ in paths])
+            counts = [part_iterations[position] for _, part_iterations in paths]
+            iterations[step] = {program: None if any(count[program] is None for count in counts)
+                                else sum(count[program] for count in counts) for program in ('PT', 'PS')}
+            if cache is not None:
+                cache.put(keys[step], solutions[step])
+    return solutions, iterations
+
+
+# the solver session and the cache of a configuration (see get_probabilities_per_worker), the key of its
+# problem in the cache and its cached solutions (None when not cached)
+def cached_solutions(config, graph, session=None, cache=None):
+    session = solvers.get_session(config.get('solver') if session is None else session)
+    cache = solution_cache.get_cache(config.get('cache') if cache is None else cache)
+    if cache is None:
+        return session, None, None, None
+    key = solution_cache.problem_key(graph, config['mu'], config['lam'], session.settings())
+    return session, cache, key, cache.get(key)
+
+
+# the connected components of the compatibility graph that hold tasks, as subgraphs (workers without any task
+# have nothing to solve)
+def components(graph):
+    parts = [part for part in nx.connected_components(graph)
+             if any(graph.nodes[node]['bipartite'] == 1 for node in part)]
+    if len(parts) <= 1:
+        return [graph]
+    return [graph.subgraph(part).copy() for part in parts]
+
+
+# a configuration restricted to the workers and the tasks of a component
+def restrict(config, part):
+    return dict(config, mu={worker: config['mu'][worker] for worker in part if worker in config['mu']},
+                lam={task: config['lam'][task] for task in part if task in config['lam']})
+
+
+# the solutions of the configurations on a component, not cached (the whole graph is)
+def component_solutions(configs, part, backend):
+    return [get_probabilities_per_worker(config, part, backend, cache=False) for config in configs]
+
+
+# the configurations on a component solved as a path (see solve_path), not cached
+def component_path(configs, part, backend):
+    return solve_path(configs, part, backend, cache=False)
+
+
+# run solve(configs restricted to a component, component, backend) for every component. A backend given by
+# name (or None) is started in every process of a pool of max_workers processes (default: one per CPU, at most
+# one per component). Sessions and backend objects cannot leave this process, the components are then solved
+# one after another, as for small graphs (see PARALLEL_MIN_EDGES).
+def solve_components(solve, configs, parts, backend=None, max_workers=None):
+    jobs = [([restrict(config, part) for config in configs], part) for part in parts]
+    workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+    if workers <= 1 or sum(part.number_of_edges() for part in parts) < PARALLEL_MIN_EDGES or \
+            (backend is not None and not isinstance(backend, str)):
+        return [solve(part_configs, part, backend) for part_configs, part in jobs]
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(solve, part_configs, part, backend) for part_configs, part in jobs]
+        return [future.result() for future in futures]
+
+
+# merge the solutions of the components of a graph (as get_probabilities_per_worker): the probabilities of the
+# pairs of different components are 0, the objectives are the maxima over the components
+def merge_solutions(graph, config, part_solutions):
+    model = minmax_model.EdgeModel(graph, config['mu'], config['lam'])  # the order of the workers and the tasks
+    merged = []
+    for program in (0, 3):  # PT, PS
+        xx = {task: {worker: 0 for worker in model.workers} for task in model.tasks}
+        for solutions in part_solutions:
+            for task, workers in solutions[program].items():
+                xx[task].update(workers)
+        merged += [xx, max(solutions[program + 1] for solutions in part_solutions),
+                   max(solutions[program + 2] for solutions in part_solutions)]
+    return tuple(merged)
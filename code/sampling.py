@@ -0,0 +1,105 @@
+import random
+from collections import OrderedDict
+import numpy as np
+
+# Weighted sampling of workers with alias tables (Vose's method): after O(k) preprocessing every draw takes
+# O(1), one uniform number. SIM draws the workers of all the tasks of a type in bulk (NumPy), SIM-F draws one
+# worker out of the free candidates of a task type, with one table per subset of free candidates.
+
+# SubsetSampler keeps the alias tables of at most SUBSET_TABLES subsets (the least recently used go first). Task
+# types with more than SUBSET_CANDIDATES candidates have too many subsets to build tables for, their workers
+# are drawn by walking the cumulative weights of the free candidates (O(k) per draw, no table).
+SUBSET_TABLES = 4096
+SUBSET_CANDIDATES = 12
+
+
+# a weight of a minimax solution as a float (the solutions may hold 1-element arrays)
+def as_weight(value):
+    return float(np.ravel(value)[0])
+
+
+# an alias table over items with the given weights, negative weights (solver noise) count as 0. At least one
+# weight has to be positive.
+class AliasTable:
+    def __init__(self, items, weights):
+        weights = np.maximum(np.array([as_weight(weight) for weight in weights], dtype=float), 0)
+        total = weights.sum()
+        if not total > 0:
+            raise ValueError("AliasTable needs a positive weight")
+        self.items = list(items)
+        n = len(self.items)
+        scaled = weights * n / total
+        prob = np.ones(n)
+        alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1
+            (small if scaled[more] < 1 else large).append(more)
+        # what is left has probability 1 (up to rounding)
+        self.prob = prob
+        self.alias = alias
+        self.prob_list = prob.tolist()
+        self.alias_list = alias.tolist()
+        self.size = n
+
+    # one draw, with the random module or a random.Random (rng; one uniform number: its integer part picks a
+    # column, its fraction decides between the column and its alias)
+    def sample(self, rng=random):
+        u = rng.random() * self.size
+        i = min(int(u), self.size - 1)
+        return self.items[i] if u - i < self.prob_list[i] else self.items[self.alias_list[i]]
+
+    # k draws at once, with NumPy (rng: a numpy Generator or the numpy.random module)
+    def sample_many(self, k, rng=np.random):
+        u = rng.random(k) * self.size
+        i = np.minimum(u.astype(int), self.size - 1)
+        index = np.where(u - i < self.prob[i], i, self.alias[i])
+        return [self.items[j] for j in index.tolist()]
+
+
+# alias tables over the subsets of the candidates of every task type, built on first use and cached by the
+# bitmask of the subset (bit k: candidate k, see simulation.EventEngine.idle), see SUBSET_TABLES and
+# SUBSET_CANDIDATES. The draws take their uniform numbers from rng (the random module or a random.Random).
+class SubsetSampler:
+    def __init__(self, candidates, weights, rng=random):
+        self.candidates = candidates  # task type -> candidate worker names, in order
+        # task type -> the weights of its candidates, in the same order (negative weights count as 0, as in
+        # AliasTable)
+        self.weights = {job_type: [max(as_weight(weight), 0.0) for weight in values]
+                        for job_type, values in weights.items()}
+        self.rng = rng
+        self.tables = OrderedDict()  # (task type, mask) -> alias table, the most recently used last
+
+    # draw a worker out of the candidates of a task type in mask. Without any positive weight in mask the first
+    # candidate in it is taken, nothing is drawn.
+    def sample(self, job_type, mask):
+        key = (job_type, mask)
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+            return table.sample(self.rng)
+        members = [k for k in range(len(self.candidates[job_type])) if mask >> k & 1]
+        if not any(self.weights[job_type][k] > 0 for k in members):
+            return self.candidates[job_type][members[0]]
+        if len(self.candidates[job_type]) > SUBSET_CANDIDATES:
+            return self.sample_members(job_type, members)
+        table = self.tables[key] = AliasTable([self.candidates[job_type][k] for k in members],
+                                              [self.weights[job_type][k] for k in members])
+        if len(self.tables) > SUBSET_TABLES:
+            self.tables.popitem(last=False)
+        return table.sample(self.rng)
+
+    # draw a worker out of the candidates of a task type with the given indices (one of them with a positive
+    # weight), walking their cumulative weights
+    def sample_members(self, job_type, members):
+        weights = [self.weights[job_type][k] for k in members]
+        u = self.rng.random() * sum(weights)
+        for k, weight in zip(members, weights):
+            u -= weight
+            if u < 0:
+                return self.candidates[job_type][k]
+        return self.candidates[job_type][members[-1]]  # rounding
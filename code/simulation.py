@@ -1,78 +1,128 @@
-import copy
+import heapq
+import itertools
 import random
+from collections import deque
 import numpy as np
+from metrics import MetricsAccumulator, QUANTILES
+from adjacency import AdjacencySnapshot
+from sampling import AliasTable, SubsetSampler
 
 
-# generate actual arrival times for all tasks in the simulation
+# generate actual arrival times for all tasks in the simulation (a sorted array): the cumulative sums of
+# exponential inter-arrival times, drawn in chunks of about twice the expected number of arrivals, up to the
+# first arrival at or after size
 def generate_arrival_times(lam, size):
+    chunk = max(int(size * lam * 2), 1)
+    chunks = []
     current_av = 0.0
-    arrivals = []
-    sz = int(size * lam * 2)
-    durations = np.random.exponential(1 / lam, size=sz)
-    ind = 0
-    while current_av < size:
-        av = durations[ind]
-        ind += 1
-        current_av = current_av + av
-        arrivals.append(current_av)
+    while True:
+        # the sums continue from the last arrival of the previous chunk
+        arrivals = np.cumsum(np.concatenate([[current_av], np.random.exponential(1 / lam, size=chunk)]))[1:]
+        end = np.searchsorted(arrivals, size, side='left')
+        if end < chunk:
+            chunks.append(arrivals[:end + 1])
+            break
+        chunks.append(arrivals)
+        current_av = arrivals[-1]
 
-    return arrivals
+    return np.concatenate(chunks)
 
 
-# generate all tasks for simulation. duration times will be determined later (on realtime).
+# generate all tasks for simulation: a TaskTable holding one stream of the arrivals of all the task types, in
+# arrival order. duration times will be determined later (on realtime).
 def generate_tasks(job_type_distributions, total_duration):
-    total_tasks = 0
-    tasks = []
-    cnt = 0
+    arrival_times = []
+    job_types = []
 
     for job_type, distribution in job_type_distributions.items():
-        arrival_times = generate_arrival_times(distribution.job_arrival_lambda, int(total_duration))
-        for arrival_time in arrival_times:
-            task_name = f"{job_type} - Task {cnt}"
-            task = Task(task_name, job_type, arrival_time)
-            cnt += 1
-            tasks.append(task)
-            total_tasks += 1
+        arrivals = generate_arrival_times(distribution.job_arrival_lambda, int(total_duration))
+        arrival_times.append(arrivals)
+        job_types.append(np.full(len(arrivals), job_type))
+
+    tasks = TaskTable(np.concatenate(arrival_times), np.concatenate(job_types)).sorted()
+    return tasks, len(tasks)
+
+
+# draw the durations of a simulation: for every worker and task type (mu[worker][task type]) one duration per
+# task, the n-th task of a type that a worker performs takes the n-th duration
+def generate_durations(mu, total_tasks):
+    durations = {}
+    for i in mu.keys():
+        durations[i] = {}
+        for j in mu[i].keys():
+            durations[i][j] = np.random.exponential(1 / mu[i][j], total_tasks)
+    return durations
+
+
+# Streaming workloads: arrivals, durations and the workers drawn in advance by SIM and SIM-F come from
+# generators that draw chunks of STREAM_CHUNK values on demand, so a run holds a bounded number of them
+# whatever the horizon. The arrivals of every task type and the durations of every worker and task type have a
+# random generator of their own, seeded from the simulation seed. The workers SIM and SIM-F draw come from the
+# generators of their policy (see ResourceAllocationSimulation.policy_random).
+STREAM_CHUNK = 4096
+
+
+# the arrival times of one task type as a stream (see generate_arrival_times), up to the first arrival at or
+# after size
+def stream_arrival_times(lam, size, rng, chunk=STREAM_CHUNK):
+    current_av = 0.0
+    while current_av < size:
+        arrivals = np.cumsum(np.concatenate([[current_av], rng.exponential(1 / lam, size=chunk)]))[1:]
+        arrivals = arrivals[:np.searchsorted(arrivals, size, side='left') + 1]
+        yield from arrivals.tolist()
+        current_av = arrivals[-1]
 
-    return tasks, total_tasks
 
+# label the arrivals of a task type for merging: ties are taken in task type order
+def label_arrivals(arrivals, position, job_type):
+    for arrival_time in arrivals:
+        yield arrival_time, position, job_type
 
-# a utility function
-def aggregate_list_items_by_type(lst):
-    aggregated_items = {}
-    for item in lst:
-        item_type = item.job_type
-        if item_type not in aggregated_items:
-            aggregated_items[item_type] = []
-        aggregated_items[item_type].append(item)
 
-    return aggregated_items
+# the tasks of all the task types as one stream of (arrival time, task type), in arrival order
+def stream_tasks(job_type_distributions, total_duration, seed=None):
+    seeds = np.random.SeedSequence([0 if seed is None else seed, 0]).spawn(len(job_type_distributions))
+    streams = [label_arrivals(stream_arrival_times(distribution.job_arrival_lambda, int(total_duration),
+                                                   np.random.default_rng(seeds[position])), position, job_type)
+               for position, (job_type, distribution) in enumerate(job_type_distributions.items())]
+    for arrival_time, _, job_type in heapq.merge(*streams):
+        yield arrival_time, job_type
 
 
-# reports the maximum waiting time and the maximum worker utilization for any algorithm
-def generate_report(completed_tasks, current_time, resources):
+# the durations of the tasks of one type at one worker (service rate mu) as a stream
+def stream_durations(mu, seed, chunk=STREAM_CHUNK):
+    rng = np.random.default_rng(seed)
+    while True:
+        yield from rng.exponential(1 / mu, size=chunk).tolist()
+
+
+# workers drawn (with replacement) from an alias table with rng (a numpy Generator), as a stream
+def stream_choices(table, rng, chunk=STREAM_CHUNK):
+    while True:
+        yield from table.sample_many(chunk, rng)
+
+
+# reports the maximum waiting time and the maximum worker utilization for any algorithm.
+# completed_tasks is the TaskTable of a run, the state of its tasks is read from run (a PolicyRun).
+# The runs of the simulation compute the same report online (see metrics.MetricsAccumulator).
+# The waiting time of a task type is the average over its workers of the waiting time relative to the
+# duration, weighted by the number of tasks of every worker (all the tasks count as one worker when the
+# workers are not recorded).
+def generate_report(completed_tasks, run, current_time, resources):
     total_time = current_time
     max_util = max([resource.usage / total_time for resource in resources])
-    aggregated_completed_tasks = aggregate_list_items_by_type(completed_tasks)
 
     mx_waits = 0
-    for key, val in aggregated_completed_tasks.items():
-        dur_per_worker = {}
-        wait_per_worker = {}
-        task_per_worker = {}
-
-        for task in val:
-            if task.worker not in dur_per_worker:
-                dur_per_worker[task.worker] = 0
-                wait_per_worker[task.worker] = 0
-                task_per_worker[task.worker] = 0
-
-            dur_per_worker[task.worker] += task.dur
-            wait_per_worker[task.worker] += task.wait_time
-            task_per_worker[task.worker] += 1
-        wait_for_task = sum(
-            [(wait_per_worker[worker] / dur_per_worker[worker]) * task_per_worker[worker] / len(val) for worker in
-             task_per_worker])
+    for key in np.unique(completed_tasks.job_type):
+        val = np.flatnonzero(completed_tasks.job_type == key)
+        workers, first, index = np.unique(run.worker[val], return_index=True, return_inverse=True)
+        # sums in task order (as bincount accumulates), workers in the order they first appear
+        dur_per_worker = np.bincount(index, run.duration[val], len(workers))
+        wait_per_worker = np.bincount(index, run.wait_time[val], len(workers))
+        task_per_worker = np.bincount(index, minlength=len(workers))
+        order = np.argsort(first)
+        wait_for_task = sum(((wait_per_worker[order] / dur_per_worker[order]) * task_per_worker[order] /
+                             len(val)).tolist())
 
         mx_waits = max(mx_waits, wait_for_task)
 
@@ -84,16 +134,25 @@ class Resource:
     def __init__(self, name):
         self.name = name
         self.capacity = 1
-        self.queue = []
-        self.eusage = 0
-        self.usage = 0
+        self.queue = deque()  # tasks that are not completed yet, the first one is in service
+        self.waiting = None  # number of tasks of every type waiting behind the one in service (see EventEngine)
+        self.usage = 0  # work assigned so far
+        self.busy_until = 0  # end time of the last task in the queue
+        self.free = True  # no expected waiting time (see EventEngine.expected_wait)
+        self.version = 0  # changes with every assignment, invalidates scheduled events
         self.available = True
-        self.update_time = 0
-        self.find = 0
+        self.find = 0  # number of completed tasks
 
+    # remaining work in the queue at a given time
+    def backlog(self, time):
+        return max(0, self.busy_until - time)
 
-# a class for the tasks and their properties
+
+# a class for the tasks and their properties, a record of one row of a TaskTable (see TaskTable.task)
 class Task:
+    __slots__ = ('name', 'resource', 'job_type', 'duration', 'start_time', 'end_time', 'dur', 'arrival_time',
+                 'is_finished', 'wait_time', 'worker')
+
     def __init__(self, name, job_type, arrival_time):
         self.name = name
         self.resource = -1
@@ -108,6 +167,67 @@ class Task:
         self.worker = -1
 
 
+# the tasks of a simulation as columns (NumPy arrays): the arrival time and the type of every task and its
+# number (the order in which the tasks were generated). Tables are read only and shared by all the runs,
+# the state of the tasks in a run is kept in a PolicyRun.
+class TaskTable:
+    def __init__(self, arrival_time, job_type, number=None):
+        self.arrival_time = arrival_time
+        self.job_type = job_type
+        self.number = np.arange(len(arrival_time)) if number is None else number
+
+    def __len__(self):
+        return len(self.arrival_time)
+
+    # the tasks in arrival order (ties keep their order), a table that is already in order is returned as is
+    def sorted(self):
+        if np.all(self.arrival_time[1:] >= self.arrival_time[:-1]):
+            return self
+        order = np.argsort(self.arrival_time, kind='stable')
+        return TaskTable(self.arrival_time[order], self.job_type[order], self.number[order])
+
+    # the number of tasks of a type
+    def count(self, job_type):
+        return int(np.count_nonzero(self.job_type == job_type))
+
+    # a Task record of one task, with its state in a run when given
+    def task(self, index, run=None):
+        job_type = self.job_type[index].item()
+        task = Task(f"{job_type} - Task {self.number[index]}", job_type, self.arrival_time[index].item())
+        if run is not None:
+            task.duration = task.dur = run.duration[index].item()
+            task.wait_time = run.wait_time[index].item()
+            task.start_time = run.start_time[index].item()
+            task.end_time = run.end_time[index].item()
+            task.worker = run.worker[index].item()
+            task.is_finished = task.end_time >= 0
+        return task
+
+    def __getitem__(self, index):
+        return self.task(index)
+
+    def __iter__(self):
+        return (self.task(index) for index in range(len(self)))
+
+
+# the state of the tasks in one policy run, by their position in the TaskTable of the run: the drawn
+# duration, the waiting, start and end times and the slot of the worker (recorded by some policies only).
+class PolicyRun:
+    def __init__(self, size):
+        self.duration = np.zeros(size)
+        self.wait_time = np.zeros(size)
+        self.start_time = np.full(size, -1.0)
+        self.end_time = np.full(size, -1.0)
+        self.worker = np.full(size, -1)
+
+    def record(self, index, job_type, worker, duration, wait_time, start_time, end_time):
+        self.duration[index] = duration
+        self.wait_time[index] = wait_time
+        self.start_time[index] = start_time
+        self.end_time[index] = end_time
+        self.worker[index] = worker
+
+
 # a class for task type
 class JobType:
     def __init__(self, name, job_arrival_lambda):
@@ -116,499 +236,443 @@ class JobType:
         self.queue = []
 
 
+# The discrete-event core shared by all the policies. Events are kept in a priority queue (heap) ordered by
+# time: moving the clock to the next arrival pops the events up to that time. There are two kinds of events:
+# task completions and the time at which a resource runs out of expected waiting time (it becomes free).
+# Every resource only queues its incomplete tasks, as (task type, start time) pairs, and counts the tasks of
+# every type waiting behind the one in service. The expected duration of a task at a resource is
+# mu[resource][task type] and the task in service counts for what is left of it (see expected_wait and
+# estimated_wait).
+# With candidates (the candidate resources of every task type, in order), the engine also keeps the free
+# candidates of every task type as a bitmask: bit k of idle[task type] is set when candidate k is free.
+# Every assignment is recorded in metrics (a metrics.MetricsAccumulator) when given.
+class EventEngine:
+    COMPLETE, FREE = 0, 1
+
+    def __init__(self, mu, candidates=None, metrics=None):
+        self.events = []
+        self.time = 0
+        self.count = 0  # breaks ties between events at equal times in insertion (FIFO) order
+        self.mu = mu
+        self.metrics = metrics
+        self.candidates = candidates
+        self.idle = None
+        self.positions = {}
+        if candidates is not None:
+            self.idle = {}
+            for job_type, resources in candidates.items():
+                self.idle[job_type] = (1 << len(resources)) - 1
+                for k, resource in enumerate(resources):
+                    self.positions.setdefault(resource.name, []).append((job_type, 1 << k))
+
+    def push(self, time, kind, resource):
+        heapq.heappush(self.events, (time, self.count, kind, resource, resource.version))
+        self.count += 1
+
+    def set_free(self, resource, free):
+        resource.free = free
+        if self.idle is not None:
+            for job_type, bit in self.positions.get(resource.name, ()):
+                if free:
+                    self.idle[job_type] |= bit
+                else:
+                    self.idle[job_type] &= ~bit
+
+    # a task starts service, once nothing waits behind it the resource becomes free when its expected
+    # duration has passed
+    def start_service(self, resource, job_type, start_time):
+        if len(resource.queue) == 1:
+            self.push(start_time + self.mu[resource.name][job_type], self.FREE, resource)
+
+    # move the clock forward, handling all the events until then
+    def advance(self, time):
+        events = self.events
+        while events and events[0][0] <= time:
+            _, _, kind, resource, version = heapq.heappop(events)
+            if kind == self.COMPLETE:
+                resource.queue.popleft()
+                resource.find += 1
+                if resource.queue:
+                    job_type, start_time = resource.queue[0]
+                    resource.waiting[job_type] -= 1
+                    self.start_service(resource, job_type, start_time)
+                else:
+                    self.set_free(resource, True)
+            elif version == resource.version and not resource.free:  # no assignment since it was scheduled
+                self.set_free(resource, True)
+        self.time = time
+
+    # the free candidates of a task type, in candidate order
+    def free_candidates(self, job_type):
+        resources = self.candidates[job_type]
+        idle = self.idle[job_type]
+        free = []
+        while idle:
+            bit = idle & -idle
+            free.append(resources[bit.bit_length() - 1])
+            idle ^= bit
+        return free
+
+    # expected waiting time at a resource: the expected duration of every task in its queue, the task in
+    # service counts for what is left of its expected duration (nothing once it ran for longer).
+    # Summed in queue order, so that ties between resources are broken as before.
+    def expected_wait(self, resource):
+        if resource.free:
+            return 0
+        mu = self.mu[resource.name]
+        job_type, start_time = resource.queue[0]
+        expected = mu[job_type]
+        if start_time < self.time:
+            expected = max(0, expected - (self.time - start_time))
+        for job_type, _ in itertools.islice(resource.queue, 1, None):
+            expected += mu[job_type]
+        return expected
+
+    # expected_wait from the counts of the waiting tasks by type: the time does not depend on the length of the
+    # queue, the sum differs from expected_wait by its rounding only (relatively, far less than GTW_TOLERANCE)
+    def estimated_wait(self, resource):
+        if resource.free:
+            return 0
+        mu = self.mu[resource.name]
+        job_type, start_time = resource.queue[0]
+        expected = mu[job_type]
+        if start_time < self.time:
+            expected = max(0, expected - (self.time - start_time))
+        for job_type, count in resource.waiting.items():
+            if count:
+                expected += mu[job_type] * count
+        return expected
+
+    # queue a task with a drawn duration at a resource and schedule its completion. The task waits for the
+    # remaining work of the resource, so its times follow from busy_until. worker is the key of the task in the
+    # report (see metrics.MetricsAccumulator). Returns its wait, start and end times.
+    def assign(self, resource, job_type, arrival_time, duration, worker=-1):
+        wait_time = resource.backlog(arrival_time)
+        start_time = arrival_time + wait_time
+        end_time = arrival_time + wait_time + duration
+        resource.queue.append((job_type, start_time))
+        if resource.waiting is None:
+            resource.waiting = dict.fromkeys(self.mu[resource.name], 0)
+        if len(resource.queue) > 1:
+            resource.waiting[job_type] += 1
+        resource.version += 1
+        resource.usage += duration
+        resource.busy_until = end_time
+        if resource.free:
+            self.set_free(resource, False)
+        if len(resource.queue) == 1:
+            self.start_service(resource, job_type, start_time)
+        self.push(end_time, self.COMPLETE, resource)
+        if self.metrics is not None:
+            self.metrics.record(job_type, worker, resource.name, duration, wait_time)
+        return wait_time, start_time, end_time
+
+
+# the state of one policy in a run (see ResourceAllocationSimulation.policy_state)
+class PolicyState:
+    def __init__(self, choose, record_worker, resources, engine, durations):
+        self.choose = choose
+        self.record_worker = record_worker
+        self.resources = resources
+        self.engine = engine
+        self.durations = durations
+        self.total_time = 0
+
+    def report(self):
+        return self.engine.metrics.report(self.total_time)
+
+
+# the policies of the simulation by name (see ResourceAllocationSimulation.policy)
+POLICIES = ('SIM_PT', 'SIM_PS', 'SIMF_PT', 'SIMF_PS', 'GTW', 'GWU')
+# GTW compares the estimated waiting times of the candidates (EventEngine.estimated_wait), those within
+# GTW_TOLERANCE (relative) of the smallest one are compared again with their exact waiting times
+GTW_TOLERANCE = 1e-9
+
+
 # The simulation class. Initialize parameters
 class ResourceAllocationSimulation:
     def __init__(self, total_duration, job_type_distributions, graph, x_values_PT, x_values_PS, tasks, total_tasks,
                  job_types,
-                 mu):
+                 mu, seed=None, durations=None):
         self.total_duration = total_duration
         self.job_type_distributions = job_type_distributions
-        self.resources = []
+        # the compatibility graph is frozen here (see adjacency.py), networkx is not used afterwards.
+        # resource registry: the resources in dense slots (the slots of the snapshot, None until the worker is
+        # added), the slot of every worker and, per task type, the slots of its candidate workers in
+        # graph.neighbors order
+        self.adjacency = AdjacencySnapshot(graph, job_type_distributions, mu, x_values_PT, x_values_PS)
+        self.resources = [None] * len(self.adjacency.workers)
+        self.slots = self.adjacency.slot
+        self.candidates = self.adjacency.candidate_slots
+        # without tasks (None) the simulation streams its workload: the tasks (see stream_tasks) and the
+        # durations are drawn while running, from random streams seeded by seed, the same for every run
+        self.streaming = tasks is None
+        self.seed = seed
+        self.quantiles = QUANTILES  # waiting time quantiles reported in the metrics of the runs
+        self.metrics = None  # the metrics of the last run (a metrics.MetricsAccumulator)
         self.tasks = tasks
+        if not self.streaming:
+            self.ordered_tasks = tasks.sorted()  # arrival order (generate_tasks already merges the arrivals in order)
+            types, counts = np.unique(tasks.job_type, return_counts=True)
+            self.task_counts = dict(zip(types.tolist(), counts.tolist()))  # number of tasks of every type
         self.total_tasks = total_tasks
 
         self.graph = graph
-        self.completed_tasks = []
         self.x_values_PT = x_values_PT
         self.x_values_PS = x_values_PS
         self.job_types = job_types
-        self.durations = {}
-        self.duration_indeces = {}
         self.Mu = mu
-        for i in self.Mu.keys():
-            self.durations[i] = {}
-            self.duration_indeces[i] = {}
-            for j in self.Mu[i].keys():
-                self.duration_indeces[i][j] = 0
-                self.durations[i][j] = np.random.exponential(1 / self.Mu[i][j], total_tasks)
-
-    # adding a worker to the simulation
-    def add_resource(self, resource):
-        self.resources.append(resource)
+        # the durations are drawn here unless given (see generate_durations), streams draw them while running
+        self.durations = {}
+        if not self.streaming:
+            self.durations = generate_durations(self.Mu, total_tasks) if durations is None else durations
 
-    # used probabilities from the PT minimax solution for deciding which worker will be assigned to which task
-    def generate_job_workers_PT(self):
+    # adding a worker to the simulation (in its slot)
+    def add_resource(self, resource):
+        self.resources[self.slots[resource.name]] = resource
+
+    # the candidate slots of every task type
+    def candidate_slots(self):
+        return self.candidates
+
+    # the durations of a run: an iterator per worker and task type, used in order (every run uses the same
+    # durations for the n-th task of a type at a worker)
+    def duration_streams(self):
+        if not self.streaming:
+            return {i: {j: iter(durations) for j, durations in self.durations[i].items()} for i in self.durations}
+        pairs = [(i, j) for i in self.Mu for j in self.Mu[i]]
+        seeds = np.random.SeedSequence([0 if self.seed is None else self.seed, 1]).spawn(len(pairs))
+        streams = {i: {} for i in self.Mu}
+        for (i, j), seed in zip(pairs, seeds):
+            streams[i][j] = stream_durations(self.Mu[i][j], seed)
+        return streams
+
+    # the tasks of a run as (arrival time, task type) in arrival order
+    def arrivals(self):
+        if self.streaming:
+            return stream_tasks(self.job_type_distributions, self.total_duration, self.seed)
+        return zip(self.ordered_tasks.arrival_time.tolist(), self.ordered_tasks.job_type.tolist())
+
+    # the random generators of a policy (name, see POLICIES): a numpy Generator for the workers drawn in advance
+    # and a random.Random for the draws of SIM-F out of the free candidates. They are seeded from the seed and
+    # the policy, so every run of a policy draws the same workers whatever runs before it; without a seed the
+    # seed is drawn from the numpy.random module.
+    def policy_random(self, name):
+        seed = np.random.randint(2 ** 32) if self.seed is None else self.seed
+        draws, choices = np.random.SeedSequence([seed, 2, POLICIES.index(name)]).spawn(2)
+        return np.random.default_rng(draws), random.Random(int(choices.generate_state(1)[0]))
+
+    # the probabilities of a minimax solution (per edge, see adjacency.py) for the candidates of every task type
+    def candidate_weights(self, x_values):
+        return {job_type: self.adjacency.edges(x_values, job_type).tolist() for job_type in self.candidates}
+
+    # the workers drawn in advance for the tasks of every type following a minimax solution (x_values, per
+    # edge), an iterator per task type. The workers of all the tasks of a type are drawn at once from an alias
+    # table, with rng (a numpy Generator or the numpy.random module).
+    def generate_job_workers(self, x_values, rng=np.random):
         task_workers = {}
-        for job_type, distribution in self.job_type_distributions.items():
-            neighbors = list(self.graph.neighbors(job_type))
-            probabilities = [self.x_values_PT[job_type][x] for x in neighbors]
-            ln = len([task for task in self.tasks if task.job_type == job_type])
-            task_workers[job_type] = random.choices(neighbors, weights=probabilities, k=ln)
-            if job_type == 2:
-                workers = {}
-                for worker in task_workers:
-                    if worker not in workers:
-                        workers[worker] = 0
-                    workers[worker] += 1
+        weights = self.candidate_weights(x_values)
+        for job_type, neighbors in self.adjacency.candidate_workers.items():
+            table = AliasTable(neighbors, weights[job_type])
+            if self.streaming:
+                task_workers[job_type] = stream_choices(table, rng)
+            else:
+                task_workers[job_type] = iter(table.sample_many(self.task_counts.get(job_type, 0), rng))
 
         return task_workers
 
-    # used probabilities from the PS minimax solution for deciding which worker will be assigned to which task
-    def generate_job_workers_PS(self):
-        task_workers = {}
-
-        for job_type, distribution in self.job_type_distributions.items():
-            neighbors = list(self.graph.neighbors(job_type))
-            probabilities = [self.x_values_PS[job_type][x] for x in neighbors]
-            ln = len([task for task in self.tasks if task.job_type == job_type])
-            task_workers[job_type] = random.choices(neighbors, weights=probabilities, k=ln)
+    # used probabilities from the PT minimax solution for deciding which worker will be assigned to which task
+    def generate_job_workers_PT(self, rng=np.random):
+        return self.generate_job_workers(self.adjacency.x_PT, rng)
 
-        return task_workers
+    # used probabilities from the PS minimax solution for deciding which worker will be assigned to which task
+    def generate_job_workers_PS(self, rng=np.random):
+        return self.generate_job_workers(self.adjacency.x_PS, rng)
 
     # choose a worker for a task, following the PT minimax solution out of a subset of the (free) workers
-    def generate_job_worker_part_PT(self, job_type, neighbors):
-
-        neighbors = [neighbor.name for neighbor in neighbors]
-        probabilities = [self.x_values_PT[job_type][x] for x in neighbors]
-        try:
-            choice = random.choices(neighbors, weights=probabilities, k=1)
-        except:
-            choice = [neighbors[0]]
-
-        return choice
+    # (rng: the random module or a random.Random)
+    def generate_job_worker_part_PT(self, rng=random):
+        return SubsetSampler(self.adjacency.candidate_workers, self.candidate_weights(self.adjacency.x_PT), rng)
 
     # choose a worker for a task, following the PS minimax solution out of a subset of the (free) workers
-    def generate_job_worker_part_PS(self, job_type, neighbors):
+    # (rng: the random module or a random.Random)
+    def generate_job_worker_part_PS(self, rng=random):
+        return SubsetSampler(self.adjacency.candidate_workers, self.candidate_weights(self.adjacency.x_PS), rng)
+
+    # the state of a policy in a run: fresh resources in the same slots, an engine with its own metrics and the
+    # position in the durations of every worker and task type (the inputs, tasks and durations, are shared).
+    # choose(job_type, resources, engine) returns the resource a task of that type is assigned to, resources
+    # holds the resources of the run by slot (see add_resource); record_worker stores the slot of that resource
+    # as the worker of the task. With track_idle the engine keeps the free candidates of every task type
+    # (engine.idle).
+    def policy_state(self, choose, record_worker=False, track_idle=False):
+        resources = [None if resource is None else Resource(resource.name) for resource in self.resources]
+        metrics = MetricsAccumulator([resource.name for resource in resources if resource is not None], self.quantiles)
+        candidates = None
+        if track_idle:
+            candidates = {job_type: [resources[slot] for slot in slots]
+                          for job_type, slots in self.candidate_slots().items()}
+        return PolicyState(choose, record_worker, resources, EventEngine(self.Mu, candidates, metrics),
+                           self.duration_streams())
+
+    # run a policy (its state) over all the tasks. The times of every task are also recorded in run (a PolicyRun
+    # over the tasks of the simulation) when given.
+    def simulate(self, state, run=None):
+        slots = self.slots
+        engine = state.engine
+        advance, assign, record_unassigned = engine.advance, engine.assign, engine.metrics.record
+        choose, resources, durations, record_worker = state.choose, state.resources, state.durations, \
+            state.record_worker
+        total_time = state.total_time
+        for index, (arrival_time, job_type) in enumerate(self.arrivals()):
+            advance(arrival_time)
+            min_resource = choose(job_type, resources, engine)
 
-        neighbors = [neighbor.name for neighbor in neighbors]
-        probabilities = [self.x_values_PS[job_type][x] for x in neighbors]
-        try:
-            choice = random.choices(neighbors, weights=probabilities, k=1)
-        except:
-            choice = [neighbors[0]]
-
-        return choice
-
-    #run the Greedy Worker Utilization heuristic (See the end of Section 4.1)
-    def run_simulation_GWU(self):
-        duration_indeces = copy.deepcopy(self.duration_indeces)
-        durations = copy.deepcopy(self.durations)
-        tasks = copy.deepcopy(self.tasks)
-        resources = copy.deepcopy(self.resources)
-        tasks.sort(key=lambda x: x.arrival_time)
-        graph = self.graph
-        total_time = 0
-
-        for cnt, task in enumerate(tasks):
-
-            for resource in resources:  # update durations of all candidates before adding a task
-                if resource.update_time < task.arrival_time:
-                    update_time = task.arrival_time - resource.update_time
-                    for item in resource.queue[resource.find:]:
-                        usage_update_time = min(update_time, item.duration)
-                        if update_time < item.duration:
-                            item.duration = item.duration - update_time
-                            resource.usage += usage_update_time
-                            break
-                        else:
-                            update_time -= item.duration
-                            item.duration = 0
-                            resource.find += 1
-                            resource.usage += usage_update_time
-
-                    resource.update_time = task.arrival_time
-
-            candidates = list(graph.neighbors(task.job_type))  # fetch candidates for assignments.
+            if min_resource:
+                duration = next(durations[min_resource.name][job_type])
+                worker = slots[min_resource.name] if record_worker else -1
+                wait_time, start_time, end_time = assign(min_resource, job_type, arrival_time, duration, worker)
+                if run is not None:
+                    run.record(index, job_type, worker, duration, wait_time, start_time, end_time)
+                if end_time > total_time:
+                    total_time = end_time
+            else:
+                record_unassigned(job_type, -1, None, 0, 0)
+        state.total_time = total_time
+        engine.advance(total_time)
+
+    # run a policy over all the tasks on the event engine (see policy_state for the arguments).
+    # The report is computed online (self.metrics holds the metrics of the run afterwards).
+    def run_policy(self, choose, record_worker=False, track_idle=False, run=None):
+        state = self.policy_state(choose, record_worker, track_idle)
+        self.simulate(state, run)
+        self.metrics = state.engine.metrics
+        return state.report()
+
+    # a policy by name, as the arguments of policy_state: (choose, record_worker, track_idle)
+    def policy(self, name):
+        if name not in POLICIES:
+            raise ValueError("Unknown policy: {} (available: {})".format(name, ", ".join(POLICIES)))
+        return getattr(self, 'policy_' + name)()
+
+    # the Greedy Worker Utilization heuristic (See the end of Section 4.1)
+    def policy_GWU(self):
+        candidate_slots = self.candidate_slots()
+
+        def choose(job_type, resources, engine):
+            candidates = candidate_slots[job_type]  # fetch candidates for assignments.
             min_usage = 10000000000
             min_resource = -1
-            for candidate in candidates:
-                resource = next((r for r in resources if r.name == candidate), None)
-                if resource.usage < min_usage:  # choose candidate with the lower utilization
-                    min_usage = resource.usage
+            for slot in candidates:
+                resource = resources[slot]
+                usage = resource.usage - resource.backlog(engine.time)  # work processed so far
+                if usage < min_usage:  # choose candidate with the lower utilization
+                    min_usage = usage
                     min_resource = resource
+            return min_resource
 
-            if min_resource:
-                task.duration = durations[min_resource.name][task.job_type][
-                    duration_indeces[min_resource.name][task.job_type]]
-                duration_indeces[min_resource.name][task.job_type] += 1
-                task.dur = task.duration
-                min_resource.queue.append(task)
-                task.wait_time = 0 if len(min_resource.queue) == 1 else sum(
-                    ## wait time can be calculated after we are done.
-                    task.duration for task in min_resource.queue[min_resource.find:-1])
-                task.start_time = task.arrival_time + task.wait_time
-                task.end_time = task.arrival_time + task.wait_time + task.duration
-                total_time = max(total_time, task.arrival_time + task.wait_time + task.duration)
-        for resource in resources:  # update durations of all candidates before adding a task
-            if resource.update_time < total_time:
-                update_time = total_time - resource.update_time
-                for item in resource.queue[resource.find:]:
-                    usage_update_time = min(update_time, item.duration)
-                    if update_time < item.duration:
-                        item.duration = item.duration - update_time
-                        resource.usage += usage_update_time
-                        break
-                    else:
-                        update_time -= item.duration
-                        item.duration = 0
-                        resource.find += 1
-                        resource.usage += usage_update_time
-
-                resource.update_time = total_time
-        return generate_report(tasks, total_time, resources)
+        return choose, False, False
 
-    # run the Greedy Task Waiting time heuristic (See the end of Section 4.1)
-    def run_simulation_GTW(self):
-        tasks = copy.deepcopy(self.tasks)
-        resources = copy.deepcopy(self.resources)
-        tasks.sort(key=lambda x: x.arrival_time)
-        duration_indeces = copy.deepcopy(self.duration_indeces)
-        durations = copy.deepcopy(self.durations)
-
-        graph = self.graph
-
-        total_time = 0
-        for task in tasks:
-            for resource in resources:  # update durations of all candidates before adding a task
-                if resource.update_time < task.arrival_time:
-                    update_time = task.arrival_time - resource.update_time
-                    for item in resource.queue[resource.find:]:
-                        if update_time < item.duration:
-                            item.duration = item.duration - update_time
-                            break
-                        else:
-                            update_time -= item.duration
-                            item.duration = 0
-                            resource.find += 1
-                    resource.update_time = task.arrival_time
-            candidates = graph.neighbors(task.job_type)  # fetch candidates for assignments.
+    # the Greedy Task Waiting time heuristic (See the end of Section 4.1)
+    def policy_GTW(self):
+
+        def choose(job_type, resources, engine):
+            candidates = engine.candidates[job_type]  # fetch candidates for assignments.
+            idle = engine.idle[job_type]
+            if idle:  # the first free candidate, no expected waiting time
+                return candidates[(idle & -idle).bit_length() - 1]
             min_wait = 100000
             min_resource = -1
 
-            for candidate in candidates:
-                resource = next((r for r in resources if r.name == candidate), None)
-                expected_wait = sum([0 if task.duration == 0 else self.Mu[resource.name][
-                    task.job_type] if task.dur == task.duration else
-                max(0, self.Mu[resource.name][task.job_type] - (task.dur - task.duration)) for task
-                                     in resource.queue[resource.find:]])  # choose worker for which the expected
+            # the candidates that may have the minimal expected waiting time, the exact times (summed in queue
+            # order) decide between them as they always did: the first one with the smallest time, if below
+            # min_wait
+            estimates = [engine.estimated_wait(resource) for resource in candidates]
+            bound = min(estimates) * (1 + GTW_TOLERANCE) + GTW_TOLERANCE
+            near = [resource for resource, estimate in zip(candidates, estimates) if estimate <= bound]
+            if len(near) == 1 and bound < min_wait:
+                return near[0]
+            for resource in near:
+                expected_wait = engine.expected_wait(resource)  # choose worker for which the expected
                 # waiting time is minimal
                 if expected_wait < min_wait:
                     min_wait = expected_wait
                     min_resource = resource
+            return min_resource
 
-            if min_resource:
-                min_resource.queue.append(task)
-                task.duration = durations[min_resource.name][task.job_type][
-                    duration_indeces[min_resource.name][task.job_type]]
-                duration_indeces[min_resource.name][task.job_type] += 1
-
-                task.dur = task.duration
-                min_resource.usage += task.duration
-                task.wait_time = 0 if len(min_resource.queue) == 1 else sum(
-                    task.duration for task in min_resource.queue[min_resource.find:-1])
-                task.start_time = task.arrival_time + task.wait_time
-                task.end_time = task.arrival_time + task.wait_time + task.duration
-
-                total_time = max(total_time, task.arrival_time + task.wait_time + task.duration)
-
-        for resource in resources:  # update durations of all candidates before adding a task
-            if resource.update_time < total_time:
-                update_time = total_time - resource.update_time
-                for item in resource.queue[resource.find:]:
-                    if update_time < item.duration:
-                        item.duration = item.duration - update_time
-                        break
-                    else:
-                        update_time -= item.duration
-                        item.duration = 0
-                        resource.find += 1
-                resource.update_time = total_time
-
-        return generate_report(tasks, total_time, resources)
+        return choose, False, True
+
+    # Algorithm 1 with a solution for PT
+    def policy_SIM_PT(self):
+        # job_workers contains probabilities for PT.
+        draws, _ = self.policy_random('SIM_PT')
+        return self.sim_chooser(self.generate_job_workers_PT(draws)), True, False
+
+    # Algorithm 1 with a solution for PS
+    def policy_SIM_PS(self):
+        draws, _ = self.policy_random('SIM_PS')
+        return self.sim_chooser(self.generate_job_workers_PS(draws)), False, False
+
+    # Algorithm 2 with a solution for PS
+    def policy_SIMF_PS(self):
+        draws, choices = self.policy_random('SIMF_PS')
+        return self.simf_chooser(self.generate_job_workers_PS(draws), self.generate_job_worker_part_PS(choices)), \
+            False, True
+
+    # Algorithm 2 with a solution for PT
+    def policy_SIMF_PT(self):
+        draws, choices = self.policy_random('SIMF_PT')
+        return self.simf_chooser(self.generate_job_workers_PT(draws), self.generate_job_worker_part_PT(choices)), \
+            False, True
+
+    #run the Greedy Worker Utilization heuristic (See the end of Section 4.1)
+    def run_simulation_GWU(self):
+        return self.run_policy(*self.policy('GWU'))
+
+    # run the Greedy Task Waiting time heuristic (See the end of Section 4.1)
+    def run_simulation_GTW(self):
+        return self.run_policy(*self.policy('GTW'))
 
     # run Algorithm 1 with a solution for PT
     def run_simulation_SIM_PT(self):
-        duration_indeces = copy.deepcopy(self.duration_indeces)
-        durations = copy.deepcopy(self.durations)
-        tasks = copy.deepcopy(self.tasks)
-        resources = copy.deepcopy(self.resources)
-        tasks.sort(key=lambda x: x.arrival_time)
-        job_workers = self.generate_job_workers_PT()
-        ind = {}
-        total_time = 0
-        for task in tasks:
-            if task.job_type not in ind:
-                ind[task.job_type] = 0
-            for resource in resources:  # update durations of all candidates before adding a task
-                if resource.update_time < task.arrival_time:
-                    update_time = task.arrival_time - resource.update_time
-                    for item in resource.queue[resource.find:]:
-                        if update_time < item.duration:
-                            item.duration = item.duration - update_time
-                            break
-                        else:
-                            update_time -= item.duration
-                            item.duration = 0
-                            resource.find += 1
-                    resource.update_time = task.arrival_time
-
-            resource_name = job_workers[task.job_type][ind[task.job_type]]  # job_workers contains probabilities for PT.
-            ind[task.job_type] += 1
-
-            resource = next((r for r in resources if r.name == resource_name), None)
-            min_resource = resource
-
-            if min_resource:
-                min_resource.queue.append(task)
-                task.duration = durations[min_resource.name][task.job_type][
-                    duration_indeces[min_resource.name][task.job_type]]
-                duration_indeces[min_resource.name][task.job_type] += 1
-
-                task.dur = task.duration
-                min_resource.usage += task.duration
-                task.wait_time = 0 if len(min_resource.queue) == 1 else sum(
-                    task.duration for task in min_resource.queue[min_resource.find:-1])
-                task.start_time = task.arrival_time + task.wait_time
-                task.worker = min_resource.name
-                task.end_time = task.arrival_time + task.wait_time + task.duration
-                total_time = max(total_time, task.arrival_time + task.wait_time + task.duration)
-
-        for resource in resources:  # update durations of all candidates before adding a task
-            if resource.update_time < total_time:
-                update_time = total_time - resource.update_time
-                for item in resource.queue[resource.find:]:
-                    if update_time < item.duration:
-                        item.duration = item.duration - update_time
-                        break
-                    else:
-                        update_time -= item.duration
-                        item.duration = 0
-                        resource.find += 1
-                resource.update_time = total_time
-        return generate_report(tasks, total_time, resources)
+        return self.run_policy(*self.policy('SIM_PT'))
 
     # run Algorithm 1 with a solution for PS
     def run_simulation_SIM_PS(self):
-
-        duration_indeces = copy.deepcopy(self.duration_indeces)
-        durations = copy.deepcopy(self.durations)
-        tasks = copy.deepcopy(self.tasks)
-        resources = copy.deepcopy(self.resources)
-        tasks.sort(key=lambda x: x.arrival_time)
-        job_workers = self.generate_job_workers_PS()
-        ind = {}
-        total_time = 0
-        for cnt, task in enumerate(tasks):
-            if task.job_type not in ind:
-                ind[task.job_type] = 0
-            for resource in resources:  # update durations of all candidates before adding a task
-                if resource.update_time < task.arrival_time:
-                    update_time = task.arrival_time - resource.update_time
-                    for item in resource.queue[resource.find:]:
-                        if update_time < item.duration:
-                            item.duration = item.duration - update_time
-                            break
-                        else:
-                            update_time -= item.duration
-                            resource.find += 1
-                            item.duration = 0
-                    resource.update_time = task.arrival_time
-
-            resource_name = job_workers[task.job_type][ind[task.job_type]]
-            ind[task.job_type] += 1
-
-            resource = next((r for r in resources if r.name == resource_name), None)
-            min_resource = resource
-
-            if min_resource:
-                min_resource.queue.append(task)
-                task.duration = durations[min_resource.name][task.job_type][
-                    duration_indeces[min_resource.name][task.job_type]]
-                duration_indeces[min_resource.name][task.job_type] += 1
-
-                task.dur = task.duration
-                min_resource.usage += task.duration
-                task.wait_time = 0 if len(min_resource.queue) == 1 else sum(
-                    task.duration for task in min_resource.queue[min_resource.find:-1])
-                task.start_time = task.arrival_time + task.wait_time
-                task.end_time = task.arrival_time + task.wait_time + task.duration
-                total_time = max(total_time, task.arrival_time + task.wait_time + task.duration)
-
-        for resource in resources:  # update durations of all candidates before adding a task
-            if resource.update_time < total_time:
-                update_time = total_time - resource.update_time
-                for item in resource.queue[resource.find:]:
-                    if update_time < item.duration:
-                        item.duration = item.duration - update_time
-                        break
-                    else:
-                        update_time -= item.duration
-                        resource.find += 1
-                        item.duration = 0
-                resource.update_time = total_time
-
-        return generate_report(tasks, total_time, resources)
+        return self.run_policy(*self.policy('SIM_PS'))
 
     # run Algorithm 2 with a solution for PS
     def run_simulation_SIMF_PS(self):
-        duration_indeces = copy.deepcopy(self.duration_indeces)
-        durations = copy.deepcopy(self.durations)
-        tasks = copy.deepcopy(self.tasks)
-        resources = copy.deepcopy(self.resources)
-        tasks.sort(key=lambda x: x.arrival_time)
-        graph = copy.deepcopy(self.graph)
-        job_workers = self.generate_job_workers_PS()
-        ind = {}
-
-        total_time = 0
-        for task in tasks:
-            if task.job_type not in ind:
-                ind[task.job_type] = 0
-            for resource in resources:  # update durations of all candidates before adding a task
-                if resource.update_time < task.arrival_time:
-                    update_time = task.arrival_time - resource.update_time
-                    for item in resource.queue[resource.find:]:
-                        if update_time < item.duration:
-                            item.duration = item.duration - update_time
-                            break
-                        else:
-                            update_time -= item.duration
-                            item.duration = 0
-                            resource.find += 1
-                    resource.update_time = task.arrival_time
-
-            candidates = list(graph.neighbors(task.job_type))  # fetch candidates for assignments.
-            min_resources = []
-            for candidate in candidates:
-                resource = next((r for r in resources if r.name == candidate), None)
-                expected_wait = sum([0 if task.duration == 0 else self.Mu[resource.name][
-                    task.job_type] if task.dur == task.duration else
-                max(0, self.Mu[resource.name][task.job_type] - (task.dur - task.duration)) for task
-                                     in resource.queue[resource.find:]])
-                if expected_wait == 0:
-                    min_resources.append(resource)
-
-            if len(min_resources) == 0:
-                resource_name = job_workers[task.job_type][ind[task.job_type]]
-                ind[task.job_type] += 1
-                resource = next((r for r in resources if r.name == resource_name), None)
-                min_resource = resource
-            else:
-                resource_name = self.generate_job_worker_part_PS(task.job_type, min_resources)
-                resource = next((r for r in resources if r.name == resource_name[0]), None)
-                min_resource = resource
-
-            if min_resource:
-                min_resource.queue.append(task)
-                task.duration = durations[min_resource.name][task.job_type][
-                    duration_indeces[min_resource.name][task.job_type]]
-                duration_indeces[min_resource.name][task.job_type] += 1
-                task.dur = task.duration
-                min_resource.usage += task.duration
-                task.wait_time = 0 if len(min_resource.queue) == 1 else sum(
-                    task.duration for task in min_resource.queue[min_resource.find:-1])
-                task.start_time = task.arrival_time + task.wait_time
-                task.end_time = task.arrival_time + task.wait_time + task.duration
-                total_time = max(total_time, task.arrival_time + task.wait_time + task.duration)
-
-        for resource in resources:  # update durations of all candidates before adding a task
-            if resource.update_time < total_time:
-                update_time = total_time - resource.update_time
-                for item in resource.queue[resource.find:]:
-                    if update_time < item.duration:
-                        item.duration = item.duration - update_time
-                        break
-                    else:
-                        update_time -= item.duration
-                        resource.find += 1
-                        item.duration = 0
-                resource.update_time = total_time
-
-        return generate_report(tasks, total_time, resources)
+        return self.run_policy(*self.policy('SIMF_PS'))
 
     # run Algorithm 2 with a solution for PT
     def run_simulation_SIMF_PT(self):
-        duration_indeces = copy.deepcopy(self.duration_indeces)
-        durations = copy.deepcopy(self.durations)
-        tasks = copy.deepcopy(self.tasks)
-        resources = copy.deepcopy(self.resources)
-        tasks.sort(key=lambda x: x.arrival_time)
-        graph = copy.deepcopy(self.graph)
-        job_workers = self.generate_job_workers_PT()
-        ind = {}
-
-        total_time = 0
-        for task in tasks:
-            if task.job_type not in ind:
-                ind[task.job_type] = 0
-            for resource in resources:  # update durations of all candidates before adding a task
-                if resource.update_time < task.arrival_time:
-                    update_time = task.arrival_time - resource.update_time
-                    for item in resource.queue[resource.find:]:
-                        if update_time < item.duration:
-                            item.duration = item.duration - update_time
-                            break
-                        else:
-                            update_time -= item.duration
-                            item.duration = 0
-                            resource.find += 1
-                    resource.update_time = task.arrival_time
-
-            candidates = graph.neighbors(task.job_type)  # fetch candidates for assignments.
-            min_resources = []
-            for candidate in candidates:
-                resource = next((r for r in resources if r.name == candidate), None)
-                expected_wait = sum([0 if task.duration == 0 else self.Mu[resource.name][
-                    task.job_type] if task.dur == task.duration else
-                max(0, self.Mu[resource.name][task.job_type] - (task.dur - task.duration)) for task
-                                     in resource.queue[resource.find:]])
-                if expected_wait == 0:
-                    min_resources.append(resource)
-
-            if len(min_resources) == 0:
-                resource_name = job_workers[task.job_type][ind[task.job_type]]
-                ind[task.job_type] += 1
-                resource = next((r for r in resources if r.name == resource_name), None)
-                min_resource = resource
-            else:
-                resource_name = self.generate_job_worker_part_PT(task.job_type, min_resources)
-                resource = next((r for r in resources if r.name == resource_name[0]), None)
-                min_resource = resource
+        return self.run_policy(*self.policy('SIMF_PT'))
 
-            if min_resource:
-                min_resource.queue.append(task)
-                task.duration = durations[min_resource.name][task.job_type][
-                    duration_indeces[min_resource.name][task.job_type]]
-                duration_indeces[min_resource.name][task.job_type] += 1
-                task.dur = task.duration
-                min_resource.usage += task.duration
-                task.wait_time = 0 if len(min_resource.queue) == 1 else sum(
-                    task.duration for task in min_resource.queue[min_resource.find:-1])
-                task.start_time = task.arrival_time + task.wait_time
-                task.end_time = task.arrival_time + task.wait_time + task.duration
-                total_time = max(total_time, task.arrival_time + task.wait_time + task.duration)
-
-        for resource in resources:  # update durations of all candidates before adding a task
-            if resource.update_time < total_time:
-                update_time = total_time - resource.update_time
-                for item in resource.queue[resource.find:]:
-                    if update_time < item.duration:
-                        item.duration = item.duration - update_time
-                        break
-                    else:
-                        update_time -= item.duration
-                        resource.find += 1
-                        item.duration = 0
-                resource.update_time = total_time
-
-        return generate_report(tasks, total_time, resources)
+    # Algorithm 1: assign the tasks of every type in order to the workers drawn in advance (job_workers, an
+    # iterator per task type)
+    def sim_chooser(self, job_workers):
+        slots = self.slots
+
+        def choose(job_type, resources, engine):
+            resource_name = next(job_workers[job_type])
+            return resources[slots[resource_name]]
+
+        return choose
+
+    # Algorithm 2: choose among the free candidates (no expected waiting time) with generate_part, otherwise
+    # fall back to the workers drawn in advance (job_workers, an iterator per task type). generate_part is a
+    # sampling.SubsetSampler, it draws out of the free candidates given by their bitmask.
+    def simf_chooser(self, job_workers, generate_part):
+        slots = self.slots
+
+        def choose(job_type, resources, engine):
+            idle = engine.idle[job_type]
+
+            if not idle:
+                resource_name = next(job_workers[job_type])
+                return resources[slots[resource_name]]
+            resource_name = generate_part.sample(job_type, idle)
+            return resources[slots[resource_name]]
+
+        return choose
@@ -0,0 +1,132 @@
+import contextlib
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import minmax_model
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows): entries are still written atomically
+    fcntl = None
+
+# An on-disk cache of the solutions of the minimax problems (see run_minmax_problems), shared by all the
+# processes of a machine. Entries are addressed by a hash of the problem: the compatibility graph, Mu, Lam, the
+# formulation (minmax_model.FORMULATION) and the settings of the solver. Every entry is a file written
+# atomically (a temporary file renamed in place), reads take no lock. The cache is bounded in size: a hit marks
+# its entry as used (its modification time) and the least recently used entries are removed once the entries
+# take more than max_bytes. Writes and removals take an exclusive lock on the cache directory.
+
+# the cache directory (MINMAX_CACHE in the environment, default: ~/.cache/minmax) and its size bound
+DEFAULT_DIRECTORY = os.environ.get("MINMAX_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "minmax"))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+SUFFIX = ".pkl"
+
+
+# the canonical form of a problem (json): the nodes with their side, the edges, Mu and Lam sorted, and settings
+def canonical_problem(graph, Mu, Lam, settings=None):
+    nodes = sorted((node, side) for node, side in graph.nodes(data='bipartite'))
+    edges = sorted(tuple(sorted(edge)) for edge in graph.edges())
+    mu = sorted((worker, task, float(rate)) for worker, rates in Mu.items() for task, rate in rates.items())
+    lam = sorted((task, float(rate)) for task, rate in Lam.items())
+    return json.dumps({'nodes': nodes, 'edges': edges, 'mu': mu, 'lam': lam,
+                       'formulation': minmax_model.FORMULATION, 'settings': settings}, sort_keys=True)
+
+
+# the key of a problem in the cache (a sha256 of its canonical form)
+def problem_key(graph, Mu, Lam, settings=None):
+    return hashlib.sha256(canonical_problem(graph, Mu, Lam, settings).encode()).hexdigest()
+
+
+class SolutionCache:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    # an exclusive lock on the cache for the duration of a with block (shared by all the processes)
+    @contextlib.contextmanager
+    def locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # the value stored for a key, None when there is none (or it was removed meanwhile)
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # most recently used
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    # store a value for a key, then remove the least recently used entries beyond the size bound
+    def put(self, key, value):
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            with self.locked():
+                os.replace(temporary, self.path(key))
+                self.evict(keep=key)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temporary)
+            raise
+
+    # remove the least recently used entries until the entries take at most max_bytes (keep is never removed)
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SUFFIX):
+                with contextlib.suppress(OSError):
+                    stat = os.stat(os.path.join(self.directory, name))
+                    entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name != (keep or "") + SUFFIX:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.directory, name))
+                total -= size
+
+    # remove all the entries
+    def clear(self):
+        with self.locked():
+            for name in os.listdir(self.directory):
+                if name.endswith(SUFFIX):
+                    with contextlib.suppress(OSError):
+                        os.remove(os.path.join(self.directory, name))
+
+
+_caches = {}
+
+
+# the cache of a directory (None selects the default directory, False disables caching: None is returned).
+# SolutionCache objects are returned as is.
+def get_cache(cache=None):
+    if cache is False:
+        return None
+    if cache is not None and not isinstance(cache, str):
+        return cache
+    directory = DEFAULT_DIRECTORY if cache is None else cache
+    if directory not in _caches:
+        _caches[directory] = SolutionCache(directory)
+    return _caches[directory]
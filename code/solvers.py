@@ -0,0 +1,545 @@
+import atexit
+import contextlib
+import os
+import queue
+import tempfile
+import threading
+import weakref
+import numpy as np
+from scipy import sparse
+from scipy.io import savemat
+from scipy.optimize import Bounds, LinearConstraint, NonlinearConstraint, linprog, minimize
+
+try:
+    import highspy  # optional: HiGHS with basis warm starts for the linear program of PS
+except ImportError:
+    highspy = None
+
+# Solver backends for the minimax programs.
+# A problem is a dict, as built by minmax_model, holding the constraints as sparse (CSR) matrices:
+# A, B for the inequality rows (A x <= B) and Ae, Be for the equality rows (Ae x = Be), together with the
+# variable bounds (lb, ub) and the sizes of the program. There is one x variable per edge of the compatibility
+# graph. PS problems hold num_f, num_v, erows, ierows and the index of the objective variable ('all').
+# PT problems hold x_vars, end_sums, erows, ierows, nf, nv and, for every x variable, its service rate (Mu),
+# worker position (x_worker) and task position (x_task); their variables are ordered as in
+# minmax_model.pt_problem: the x variables (task major), rho and rho^2 of every worker, the waiting time of
+# every task and the objective variable ('all') last.
+# The solve methods take an optional info dict that receives the number of iterations of the solve
+# ('iterations', None when the backend does not report it) and, for PS with highspy, the final simplex basis
+# ('basis'), which warm starts the next solve of a program of the same shape (solve_ps(problem, basis)).
+
+DEFAULT_BACKEND = "native"
+# rho is kept below 1 - PT_RHO_MARGIN by the native PT solver so that the waiting times stay finite
+PT_RHO_MARGIN = 1e-9
+# the native PT solver takes linear programming steps until they improve the objective by less than
+# PT_LP_TOLERANCE (relative), the steps that look for edges to add to the support are at most PT_PRICING_STEP.
+# Programs of at most PT_DIRECT_EDGES edges are solved over all their edges at once.
+PT_LP_TOLERANCE = 1e-6
+PT_PRICING_STEP = 1e-3
+PT_DIRECT_EDGES = 150
+# SLSQP can keep stepping at the rounding error of a solution, PTProgram.polish stops it after
+# PT_POLISH_ITERATIONS iterations plus one per edge (the pricing step then checks the point)
+PT_POLISH_ITERATIONS = 50
+# largest violation of the task sums accepted in a solution of the native PT solver, and smallest step
+PT_FEASIBILITY = 1e-9
+
+
+# the constraints of a problem
+def constraint_matrices(problem):
+    return problem['A'], np.asarray(problem['B'], dtype=float), problem['Ae'], np.asarray(problem['Be'], dtype=float)
+
+
+# variable bounds of a problem with num_v variables, as (lower, upper) arrays
+def variable_bounds(problem, num_v):
+    if 'lb' not in problem:
+        return np.full(num_v, -np.inf), np.full(num_v, np.inf)
+    return np.array(problem['lb'], dtype=float), np.array(problem['ub'], dtype=float)
+
+
+# index maps of the PT waiting time terms x * mu * rho2 / (1 - rho): one entry per (worker, task) edge
+def pt_terms(problem):
+    edges = np.arange(problem['x_vars'])
+    task = np.array(problem['x_task'], dtype=int)  # row of the task in the first end_sums equality rows
+    rho = problem['x_vars'] + np.array(problem['x_worker'], dtype=int)
+    rho2 = rho + problem['nf']
+    return edges, np.array(problem['Mu'], dtype=float), task, rho, rho2
+
+
+# complete the x variables of a PT warm start with the matching auxiliary variables (rho, rho^2, waiting times)
+def pt_start(problem, x0):
+    x_vars, nf, nv = problem['x_vars'], problem['nf'], problem['nv']
+    x = np.zeros(nv)
+    _, _, Ae, _ = constraint_matrices(problem)
+    end_sums = problem['end_sums']
+    if x0 is None:  # start from the assignment with the minimal maximum utilization (a linear program)
+        sums = Ae[:end_sums, :x_vars]
+        rhos = Ae[end_sums:end_sums + nf, :x_vars]
+        c = np.zeros(x_vars + 1)
+        c[x_vars] = 1
+        lower, upper = variable_bounds(problem, nv)
+        bounds = np.vstack([np.column_stack([lower[:x_vars], upper[:x_vars]]), [-np.inf, np.inf]])
+        res = linprog(c, A_ub=sparse.hstack([rhos, -np.ones((nf, 1))]), b_ub=np.zeros(nf),
+                      A_eq=sparse.hstack([sums, np.zeros((end_sums, 1))]), b_eq=np.ones(end_sums),
+                      bounds=bounds, method="highs")
+        if res.status != 0:
+            raise RuntimeError("PT start point failed: {}".format(res.message))
+        x[:x_vars] = res.x[:x_vars]
+    else:
+        x[:x_vars] = np.ravel(x0)
+    x[x_vars:x_vars + 2 * nf] = Ae[end_sums:end_sums + 2 * nf, :x_vars] @ x[:x_vars]
+    edges, mu, task, rho, rho2 = pt_terms(problem)
+    waits = np.bincount(task, x[edges] * mu * x[rho2] / (1 - np.minimum(x[rho], 1 - PT_RHO_MARGIN)),
+                        minlength=end_sums)
+    x[x_vars + 2 * nf:nv - 1] = waits
+    x[nv - 1] = waits.max()
+    return x
+
+
+# The minimax program of PT over the x variables only: rho and rho^2 are linear in x (rows of Ae), so the
+# auxiliary variables are left out and the program is to minimize the maximum waiting time W_j(x) over the
+# assignments (task sums of 1, bounds on x) that keep every rho below 1 - PT_RHO_MARGIN.
+# It is solved in two stages. Trust region steps of linear programs (the waiting times linearized, sparse, on
+# HiGHS) bring x close to a solution, every iterate meets the linear constraints. Few edges carry a share at
+# a solution (about one per worker and task), so SLSQP then solves the program over these edges only (the
+# support). A last linear program checks that no step over all the edges decreases the objective, otherwise
+# the edges it moves are added to the support and the support is solved again. Small programs skip the first
+# stage, their support is all the edges.
+class PTProgram:
+    def __init__(self, problem):
+        x_vars, nf, rows = problem['x_vars'], problem['nf'], problem['end_sums']
+        _, _, Ae, _ = constraint_matrices(problem)
+        Ae = Ae.tocsr()
+        self.x_vars = x_vars
+        self.nf = nf
+        self.rows = rows
+        self.sums = Ae[:rows, :x_vars]
+        self.loads = Ae[rows:rows + nf, :x_vars]
+        self.loads2 = Ae[rows + nf:rows + 2 * nf, :x_vars]
+        self.mu = np.array(problem['Mu'], dtype=float)
+        self.task = np.array(problem['x_task'], dtype=int)
+        self.worker = np.array(problem['x_worker'], dtype=int)
+        lower, upper = variable_bounds(problem, problem['nv'])
+        self.lower = lower[:x_vars]
+        self.upper = upper[:x_vars]
+        self.cap = 1 - PT_RHO_MARGIN
+        self.iterations = 0
+        # the coefficients of every edge in the rho and rho^2 of its worker, and the pattern of the jacobian:
+        # every pair (f, e) of edges of the same worker adds to the derivative of the task of f by e
+        self.load = np.asarray(self.loads.sum(axis=0)).ravel()
+        self.load2 = np.asarray(self.loads2.sum(axis=0)).ravel()
+        order = np.argsort(self.worker, kind='stable')
+        starts = np.searchsorted(self.worker[order], np.arange(nf + 1))
+        self.pair_f = np.concatenate([np.repeat(order[a:b], b - a) for a, b in zip(starts[:-1], starts[1:])])
+        self.pair_e = np.concatenate([np.tile(order[a:b], b - a) for a, b in zip(starts[:-1], starts[1:])])
+        pattern = sparse.csr_matrix((np.arange(1, len(self.pair_f) + 1), (self.task[self.pair_f], self.pair_e)),
+                                    shape=(rows, x_vars))
+        pattern.sum_duplicates()
+        self.indptr, self.indices = pattern.indptr, pattern.indices
+        # the position of every pair in the data of the jacobian
+        self.entry = np.empty(len(self.pair_f), dtype=int)
+        keys = self.task[self.pair_f] * x_vars + self.pair_e
+        rows_of = np.repeat(np.arange(rows), np.diff(self.indptr))
+        self.entry[np.argsort(keys, kind='stable')] = np.searchsorted(rows_of * x_vars + self.indices,
+                                                                       np.sort(keys, kind='stable'))
+
+    # the waiting time of every task, sum_i x_ij * mu_ij * rho2_i / (1 - rho_i)
+    def waits(self, x):
+        free = 1 / (1 - self.loads @ x)
+        rho2 = self.loads2 @ x
+        return np.bincount(self.task, x * self.mu * (rho2 * free)[self.worker], minlength=self.rows)
+
+    # the derivatives of the waiting times (a sparse tasks x edges matrix): the direct term of every edge and,
+    # through rho and rho^2, the terms of the edges of the same worker
+    def jacobian(self, x):
+        free = (1 / (1 - self.loads @ x))[self.worker]
+        rho2 = (self.loads2 @ x)[self.worker]
+        d_rho2 = x * self.mu * free
+        d_rho = d_rho2 * rho2 * free
+        f, e = self.pair_f, self.pair_e
+        values = d_rho2[f] * self.load2[e] + d_rho[f] * self.load[e]
+        values[f == e] += (self.mu * rho2 * free)[f[f == e]]
+        data = np.bincount(self.entry, values, minlength=len(self.indices))
+        return sparse.csr_matrix((data, self.indices, self.indptr), shape=(self.rows, self.x_vars))
+
+    # the linear program of a step d from x (waits: the waiting times at x) of at most radius per edge:
+    # minimize the maximum of the linearized waiting times. Returns d and that maximum.
+    def step(self, x, waits, radius):
+        n = self.x_vars
+        c = np.zeros(n + 1)
+        c[n] = 1
+        A = sparse.vstack([sparse.hstack([self.jacobian(x), -np.ones((self.rows, 1))]),
+                           sparse.hstack([self.loads, sparse.csr_matrix((self.nf, 1))])])
+        b = np.concatenate([-waits, self.cap - self.loads @ x])
+        bounds = np.column_stack([np.append(np.maximum(self.lower - x, -radius), -np.inf),
+                                  np.append(np.minimum(self.upper - x, radius), np.inf)])
+        res = linprog(c, A_ub=A, b_ub=b, A_eq=sparse.hstack([self.sums, sparse.csr_matrix((self.rows, 1))]),
+                      b_eq=np.zeros(self.rows), bounds=bounds, method="highs")
+        if res.status != 0:
+            raise RuntimeError("PT minimax program failed: {}".format(res.message))
+        self.iterations += 1
+        return res.x[:n], res.x[n]
+
+    # trust region steps from x until they improve the objective by less than tolerance (relative) or after
+    # max_iterations steps
+    def descend(self, x, radius, tolerance, max_iterations):
+        waits = self.waits(x)
+        objective = waits.max()
+        for _ in range(max_iterations):
+            d, model = self.step(x, waits, radius)
+            predicted = objective - model
+            if predicted <= tolerance * objective:
+                break
+            new_waits = self.waits(x + d)
+            ratio = (objective - new_waits.max()) / predicted
+            if ratio > 0.01:
+                x, waits, objective = x + d, new_waits, new_waits.max()
+            if ratio > 0.75 and np.abs(d).max() > 0.99 * radius:
+                radius *= 2
+            elif ratio < 0.25:
+                radius = np.abs(d).max() / 4
+                if radius < PT_FEASIBILITY:  # steps this small change nothing any more
+                    break
+        return x
+
+    # solve the program over the edges of support (the other x are 0) with SLSQP, from x. Returns the solution,
+    # None when it is not feasible.
+    def polish(self, x, support, tolerance, max_iterations):
+        edges = np.flatnonzero(support)
+        n = len(edges)
+        workers = np.unique(self.worker[edges])
+
+        def spread(z):
+            y = np.zeros(self.x_vars)
+            y[edges] = z[:n]
+            return y
+
+        def margins(z):
+            return z[n] - self.waits(spread(z))
+
+        def margins_jacobian(z):
+            return np.hstack([-self.jacobian(spread(z))[:, edges].toarray(), np.ones((self.rows, 1))])
+
+        c = np.zeros(n + 1)
+        c[n] = 1
+        constraints = [LinearConstraint(np.hstack([self.sums[:, edges].toarray(), np.zeros((self.rows, 1))]), 1, 1),
+                       LinearConstraint(np.hstack([self.loads[workers][:, edges].toarray(),
+                                                   np.zeros((len(workers), 1))]), -np.inf, self.cap),
+                       NonlinearConstraint(margins, 0, np.inf, jac=margins_jacobian)]
+        res = minimize(lambda z: z[n], np.append(x[edges], self.waits(x).max()), jac=lambda z: c, method="SLSQP",
+                       bounds=Bounds(np.append(self.lower[edges], -np.inf), np.append(self.upper[edges], np.inf)),
+                       constraints=constraints, options={'maxiter': min(max_iterations, PT_POLISH_ITERATIONS + n),
+                                                         'ftol': tolerance})
+        self.iterations += res.nit
+        # SLSQP may stop short of its tolerance (e.g. on a failed line search) at a point that is still good
+        x = np.clip(spread(res.x), self.lower, self.upper)
+        if (self.loads @ x).max() >= self.cap or np.abs(self.sums @ x - 1).max() > PT_FEASIBILITY:
+            return None
+        return x
+
+    # solve the program from x. Iterations: the steps of the linear programs and the iterations of SLSQP.
+    # stationarity: the largest decrease of the objective (relative) that a step may still predict.
+    # support: the support of a warm start (a previous solution), SLSQP starts on it right away.
+    # self.support holds the support of the solution afterwards.
+    def solve(self, x, tolerance, stationarity, max_iterations, support=None):
+        if support is not None:
+            support = support | (x > 0)
+        elif self.x_vars <= PT_DIRECT_EDGES:
+            support = np.ones(self.x_vars, dtype=bool)
+        else:
+            x = self.descend(x, 0.1, PT_LP_TOLERANCE, max_iterations)
+            support = x > 0
+        x = self.solve_support(x, support, tolerance, stationarity, max_iterations)
+        self.support = x > 0
+        return x
+
+    # see solve, from the support given
+    def solve_support(self, x, support, tolerance, stationarity, max_iterations):
+        while self.iterations < max_iterations:
+            # changes of the objective far below what the pricing step accepts only slow SLSQP down
+            polished = self.polish(x, support, max(tolerance, 0.01 * stationarity * self.waits(x).max()),
+                                   max_iterations)
+            if polished is not None and self.waits(polished).max() <= self.waits(x).max() * (1 + tolerance):
+                x = polished
+            waits = self.waits(x)
+            d, model = self.step(x, waits, PT_PRICING_STEP)
+            if waits.max() - model <= stationarity * waits.max():
+                return x
+            grown = support | (x > 0) | (d > 0)
+            if np.array_equal(grown, support):  # nothing left to add, the linear programs finish from x
+                return self.descend(x, PT_PRICING_STEP, stationarity, max_iterations - self.iterations)
+            support = grown
+        raise RuntimeError("PT minimax program failed: iteration limit reached")
+
+
+# the warm start that a native PT solve leaves in info['start'] for the next solve of a program over the same
+# edges (e.g. along a path of loads): the x variables of its solution (not rounded) and their support
+class PTStart:
+    def __init__(self, x, support):
+        self.x = x
+        self.support = support
+
+
+# solve the programs in-process (SciPy / HiGHS), no MATLAB required
+class NativeBackend:
+    name = "native"
+
+    def __init__(self, max_iterations=1000, tolerance=1e-12, stationarity=1e-9):
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.stationarity = stationarity
+
+    # the settings that determine the solutions (see solution_cache.py)
+    def settings(self):
+        return {'backend': self.name, 'max_iterations': self.max_iterations, 'tolerance': self.tolerance,
+                'stationarity': self.stationarity}
+
+    # nothing to start or shut down for the in-process solver
+    def start(self):
+        return self
+
+    def quit(self):
+        pass
+
+    # run the linear program of PS: minimize the 'all' variable subject to the constraints.
+    # Solves with a basis or an info dict run on highspy when it is installed (scipy cannot warm start).
+    def solve_ps(self, problem, basis=None, info=None):
+        if highspy is not None and (basis is not None or info is not None):
+            return self.solve_ps_highs(problem, basis, info)
+        A, b, Ae, be = constraint_matrices(problem)
+        c = np.zeros(problem['num_v'])
+        c[problem['all']] = 1
+        res = linprog(c, A_ub=A, b_ub=b, A_eq=Ae, b_eq=be,
+                      bounds=np.column_stack(variable_bounds(problem, problem['num_v'])), method="highs")
+        if res.status != 0:
+            raise RuntimeError("PS linear program failed: {}".format(res.message))
+        if info is not None:
+            info['iterations'] = res.nit
+        # same (column) layout as the solution returned by the matlab engine
+        return res.x.reshape(-1, 1), res.fun
+
+    # the linear program of PS on highspy, started from basis when given
+    def solve_ps_highs(self, problem, basis=None, info=None):
+        A, b, Ae, be = constraint_matrices(problem)
+        lower, upper = variable_bounds(problem, problem['num_v'])
+        matrix = sparse.vstack([A, Ae]).tocsc()
+        lp = highspy.HighsLp()
+        lp.num_col_ = problem['num_v']
+        lp.num_row_ = matrix.shape[0]
+        cost = np.zeros(problem['num_v'])
+        cost[problem['all']] = 1
+        lp.col_cost_ = cost
+        lp.col_lower_ = lower
+        lp.col_upper_ = upper
+        lp.row_lower_ = np.concatenate([np.full(len(b), -highspy.kHighsInf), be])
+        lp.row_upper_ = np.concatenate([b, be])
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = matrix.indptr
+        lp.a_matrix_.index_ = matrix.indices
+        lp.a_matrix_.value_ = matrix.data
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", False)
+        h.passModel(lp)
+        if basis is not None:
+            h.setBasis(basis)
+        h.run()
+        if h.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            raise RuntimeError("PS linear program failed: {}".format(h.modelStatusToString(h.getModelStatus())))
+        if info is not None:
+            info['iterations'] = h.getInfo().simplex_iteration_count
+            info['basis'] = h.getBasis()
+        return np.array(h.getSolution().col_value).reshape(-1, 1), h.getInfo().objective_function_value
+
+    # run the minimax program of PT: minimize the 'all' variable subject to the linear constraints and the
+    # waiting time constraints sum_i x_ij * mu_ij * rho2_i / (1 - rho_i) = w_j, over the x variables only (see
+    # PTProgram). The warm start x0 is the x variables of a previous solution or, better, the PTStart of a previous
+    # solve (info['start']): its x is not rounded and its support is reused. A warm start that no longer keeps
+    # every rho below 1 is replaced by the default start.
+    def solve_pt(self, problem, x0=None, info=None):
+        program = PTProgram(problem)
+        support = None
+        if isinstance(x0, PTStart):
+            x0, support = x0.x, x0.support
+        x = pt_start(problem, x0)[:problem['x_vars']]
+        if x0 is not None and (program.loads @ x).max() >= program.cap:
+            x, support = pt_start(problem, None)[:problem['x_vars']], None
+        if (program.loads @ x).max() >= program.cap:
+            raise RuntimeError("PT minimax program failed: no assignment keeps every utilization below 1")
+        x = program.solve(x, self.tolerance, self.stationarity, self.max_iterations, support)
+        if info is not None:
+            info['iterations'] = program.iterations
+            info['start'] = PTStart(x, program.support)
+        # the auxiliary variables follow from x, same (column) layout as the solution of the matlab engine
+        x = pt_start(problem, x)
+        return x.reshape(-1, 1), x[-1]
+
+
+# solve the programs with matlab (ps.m / pt.m) through the matlab engine for python
+class MatlabBackend:
+    name = "matlab"
+
+    def __init__(self, handoff="memory"):
+        if handoff not in ("memory", "file"):
+            raise ValueError("Unknown problem hand-off: {} (available: memory, file)".format(handoff))
+        self.handoff = handoff
+        self.eng = None
+        self.future = None
+
+    # the settings that determine the solutions (the solver options are set in ps.m and pt.m)
+    def settings(self):
+        return {'backend': self.name}
+
+    # start the engine in the background, start() waits for it
+    def start_background(self):
+        if self.eng is None and self.future is None:
+            import matlab.engine  # optional dependency, only needed for this backend
+            self.future = matlab.engine.start_matlab(background=True)
+
+    def start(self):
+        if self.eng is None:
+            self.start_background()
+            self.eng = self.future.result()
+            self.future = None
+        return self.eng
+
+    def quit(self):
+        if self.future is not None:
+            self.eng = self.future.result()
+            self.future = None
+        if self.eng is not None:
+            self.eng.quit()
+            self.eng = None
+
+    # hand a problem to matlab: in memory as a struct of double arrays or, with handoff="file", as the path of
+    # a binary .mat file in a scratch directory of its own (removed after the solve).
+    # The constraint matrices are passed as (0-based) COO triplets: I, J, V and Ie, Je, Ve.
+    @contextlib.contextmanager
+    def matlab_problem(self, problem):
+        A, Ae = problem['A'].tocoo(), problem['Ae'].tocoo()
+        problem = dict(problem, I=A.row, J=A.col, V=A.data, Ie=Ae.row, Je=Ae.col, Ve=Ae.data)
+        del problem['A'], problem['Ae']
+        if self.handoff == "memory":
+            import matlab
+            yield {key: matlab.double(np.asarray(value, dtype=float).ravel()) if np.ndim(value) else float(value)
+                   for key, value in problem.items()}
+        else:
+            with tempfile.TemporaryDirectory(prefix="minmax-") as folder:
+                filename = os.path.join(folder, "problem.mat")
+                savemat(filename, {key: np.asarray(value, dtype=float) for key, value in problem.items()})
+                yield filename
+
+    # linprog of matlab has no warm start, basis is ignored
+    def solve_ps(self, problem, basis=None, info=None):
+        with self.matlab_problem(problem) as p:
+            if info is None:
+                x, v = self.start().ps(p, nargout=2)
+            else:
+                x, v, info['iterations'] = self.start().ps(p, nargout=3)
+        return np.array(x), v
+
+    # fmincon of matlab starts from the x of a PTStart, without its support
+    def solve_pt(self, problem, x0=None, info=None):
+        if isinstance(x0, PTStart):
+            x0 = x0.x
+        if x0 is not None:
+            problem = dict(problem, x0=pt_start(problem, x0))
+        with self.matlab_problem(problem) as p:
+            if info is None:
+                x, v = self.start().pt(p, nargout=2)
+            else:
+                x, v, info['iterations'] = self.start().pt(p, nargout=3)
+        return np.array(x), v
+
+
+BACKENDS = {
+    NativeBackend.name: NativeBackend,
+    MatlabBackend.name: MatlabBackend,
+}
+
+
+# create a backend by name (None selects the default backend), backend objects are returned as is
+def get_backend(name=None):
+    if name is not None and not isinstance(name, str):
+        return name
+    name = DEFAULT_BACKEND if name is None else name
+    if name not in BACKENDS:
+        raise ValueError("Unknown solver backend: {} (available: {})".format(name, ", ".join(BACKENDS)))
+    return BACKENDS[name]()
+
+
+# A solver session starts its backend once and reuses it for every solve. With pool_size > 1 it holds a pool
+# of backends (e.g. matlab engines) so that concurrent callers (threads) solve in parallel, each solve
+# borrowing one backend from the pool. Sessions can be used as backends and are shut down at exit.
+class SolverSession:
+    def __init__(self, backend=None, pool_size=1):
+        if backend is None or isinstance(backend, str):
+            self.backends = [get_backend(backend) for _ in range(pool_size)]
+        else:  # an existing backend object
+            self.backends = [backend]
+        self.name = self.backends[0].name
+        self.pool = queue.Queue()
+        for backend in self.backends:
+            self.pool.put(backend)
+        _sessions.add(self)
+
+    # start all the backends now (in parallel when supported) instead of on their first solve
+    def start(self):
+        for backend in self.backends:
+            if hasattr(backend, 'start_background'):
+                backend.start_background()
+        for backend in self.backends:
+            backend.start()
+        return self
+
+    # borrow a backend from the pool for the duration of a with block
+    @contextlib.contextmanager
+    def acquire(self):
+        backend = self.pool.get()
+        try:
+            yield backend
+        finally:
+            self.pool.put(backend)
+
+    def settings(self):
+        return self.backends[0].settings()
+
+    def solve_ps(self, problem, basis=None, info=None):
+        with self.acquire() as backend:
+            return backend.solve_ps(problem, basis, info)
+
+    def solve_pt(self, problem, x0=None, info=None):
+        with self.acquire() as backend:
+            return backend.solve_pt(problem, x0, info)
+
+    def quit(self):
+        for backend in self.backends:
+            backend.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.quit()
+
+
+_sessions = weakref.WeakSet()
+_shared_sessions = {}
+_shared_lock = threading.Lock()
+
+
+# the session shared by all callers for a backend name (None selects the default backend).
+# Sessions and backend objects are returned as is.
+def get_session(backend=None):
+    if backend is not None and not isinstance(backend, str):
+        return backend
+    name = DEFAULT_BACKEND if backend is None else backend
+    with _shared_lock:
+        if name not in _shared_sessions:
+            _shared_sessions[name] = SolverSession(name)
+        return _shared_sessions[name]
+
+
+# shut down every session (and its engines) when the interpreter exits
+@atexit.register
+def close_sessions():
+    for session in list(_sessions):
+        session.quit()
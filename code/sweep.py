@@ -0,0 +1,182 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+import main
+import parallel
+import run_minmax_problems
+import simulation
+import solution_cache
+
+# Parameter sweeps: the policies are run on every point of a grid of parameters (kappa, the load in requests per
+# day, the arrival distribution lam and the simulation duration) with every seed. The minimax problems are
+# solved once per distinct (graph, Mu, Lam), the durations do not change them, warm started along the loads,
+# and the solves and the runs are all scheduled over one process pool (see parallel.run_jobs). Every completed run is appended to a results
+# file right away, so that running an interrupted sweep again only runs what is missing.
+
+# the parameters of a point, the columns of the sweep results before those of parallel.TABLE_COLUMNS
+POINT_COLUMNS = ['kappa', 'load', 'lam', 'duration']
+TABLE_COLUMNS = POINT_COLUMNS + parallel.TABLE_COLUMNS
+
+
+# the points of a grid: every combination of the values of kappa, load, lam (arrival distributions) and duration
+def grid(kappas, loads, lams, durations=(604800,)):
+    return [{'kappa': kappa, 'load': load, 'lam': list(lam), 'duration': duration}
+            for kappa, load, lam, duration in itertools.product(kappas, loads, lams, durations)]
+
+
+# the name of a point, the scenario name of its runs
+def point_name(point):
+    return "kappa-{},load-{},lam-{},duration-{}".format(point['kappa'], point['load'], point['lam'],
+                                                      point['duration'])
+
+
+# the minimax problems of a configuration are the same for the same graph, Mu and Lam
+def problem_key(graph, config):
+    return solution_cache.problem_key(graph, config['mu'], config['lam'])
+
+
+# solve the problems of a path of configurations in order, each solve warm started from the previous one (see
+# run_minmax_problems.solve_path), their scenarios
+def solve_path(configs, graph):
+    solutions, _ = run_minmax_problems.solve_path(configs, graph)
+    return [parallel.Scenario(config['name'], graph, config, xx1, xx2, (pt1, ps1), (pt2, ps2))
+            for config, (xx1, pt1, ps1, xx2, pt2, ps2) in zip(configs, solutions)]
+
+
+# the completed runs of a sweep, in a file of json lines (one row of TABLE_COLUMNS per line). Rows are added
+# from the callbacks of the pool (see parallel.run_jobs), one at a time.
+class ResultStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.rows = {}
+        if path is not None and os.path.exists(path):
+            with open(path, "r+") as f:
+                text = f.read()
+                # a last line cut short by an interruption is dropped, that run is done again
+                if not text.endswith("\n"):
+                    text = text[:text.rfind("\n") + 1]
+                    f.seek(0)
+                    f.truncate(len(text.encode()))
+            for line in text.splitlines():
+                row = json.loads(line)
+                self.rows[(row['scenario'], row['seed'], row['policy'])] = row
+
+    def done(self, scenario, seed, policy):
+        return (scenario, seed, policy) in self.rows
+
+    def add(self, row):
+        with self.lock:
+            self.rows[(row['scenario'], row['seed'], row['policy'])] = row
+            if self.path is not None:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(row) + "\n")
+
+
+# run the policies with every seed on every point (see grid), over a pool of max_workers processes (default:
+# one per CPU). Completed runs are kept in results (a file, see ResultStore) and not run again.
+# solver is the solver backend of the minimax problems (see solvers.BACKENDS, default: the default backend).
+# Returns the rows of all the runs of the sweep (TABLE_COLUMNS), in (point, seed, policy) order.
+def run_sweep(points, policies=simulation.POLICIES, seeds=(0,), results=None, max_workers=None, solver=None,
+              stream=False):
+    store = ResultStore(results)
+    names = [point_name(point) for point in points]
+    todo = [(name, point) for name, point in zip(names, points)
+            if not all(store.done(name, seed, policy) for seed in seeds for policy in policies)]
+
+    with parallel.process_pool(max_workers) as pool:
+        # solve the distinct problems of the points that are not done, as paths of growing loads (one per kappa
+        # and arrival distribution, see solve_path)
+        configs = {}
+        paths = {}
+        for name, point in todo:
+            config, graph = main.make_config(point['kappa'], point['load'], point['lam'], point['duration'])
+            if solver is not None:
+                config['solver'] = solver
+            key = problem_key(graph, config)
+            configs[name] = (config, graph, key)
+            path = paths.setdefault((point['kappa'], tuple(point['lam'])), {})
+            path.setdefault(key, (point['load'], config, graph))
+        solves = {}
+        for path in paths.values():
+            keys = sorted(path, key=lambda key: path[key][0])
+            future = pool.submit(solve_path, [path[key][1] for key in keys], path[keys[0]][2])
+            for position, key in enumerate(keys):
+                solves[key] = (future, position)
+        scenarios = []
+        for name, point in todo:
+            config, graph, key = configs[name]
+            future, position = solves[key]
+            solved = future.result()[position]
+            scenarios.append(parallel.Scenario(name, graph, config, solved.x_values_PT, solved.x_values_PS,
+                                               solved.opt_PT, solved.opt_PS))
+
+        # run the simulations, every row is stored with the parameters of its point
+        by_name = dict(zip(names, points))
+
+        def store_row(row):
+            point = by_name[row['scenario']]
+            store.add(dict({column: point[column] for column in POINT_COLUMNS}, **row))
+
+        parallel.run_jobs(scenarios, policies, seeds, stream=stream, pool=pool,
+                          skip=lambda scenario, seed, policy: store.done(scenario.name, seed, policy),
+                          callback=store_row)
+
+    return [store.rows[(name, seed, policy)] for name in names for seed in seeds for policy in policies]
+
+
+# a number given on the command line, integral values as int (as in the names of the points)
+def number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+# a list of floats given as "a,b,c"
+def float_list(text):
+    return [float(value) for value in text.split(",")]
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Run the policies over a grid of parameters")
+    parser.add_argument("--kappa", type=number, nargs="+", default=[2])
+    parser.add_argument("--load", type=number, nargs="+", default=[120000], help="requests per day")
+    parser.add_argument("--lam", type=float_list, nargs="+", default=[[0.25, 0.25, 0.25, 0.25]],
+                        help="arrival distributions over the task types, as comma separated values")
+    parser.add_argument("--duration", type=int, nargs="+", default=[604800], help="simulation durations in seconds")
+    parser.add_argument("--zip", action="store_true",
+                        help="take the parameter lists side by side (a list of points) instead of their grid")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--policies", nargs="+", default=list(simulation.POLICIES), choices=simulation.POLICIES)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: one per CPU)")
+    parser.add_argument("--solver", default=None, help="solver backend of the minimax problems")
+    parser.add_argument("--stream", action="store_true", help="draw the workloads in the workers")
+    parser.add_argument("--results", default="sweep_results.jsonl",
+                        help="file of the completed runs, a sweep resumes from it")
+    parser.add_argument("--csv", help="write the results table to this file")
+    return parser.parse_args(argv)
+
+
+# run a sweep from the command line and print the results table
+def run(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.zip:
+        lists = [args.kappa, args.load, args.lam, args.duration]
+        size = max(len(values) for values in lists)
+        if any(len(values) not in (1, size) for values in lists):
+            raise SystemExit("--zip: the parameter lists must have the same length (or a single value)")
+        points = [{'kappa': kappa, 'load': load, 'lam': lam, 'duration': duration}
+                  for kappa, load, lam, duration in zip(*[values * size if len(values) == 1 else values
+                                                          for values in lists])]
+    else:
+        points = grid(args.kappa, args.load, args.lam, args.duration)
+    rows = run_sweep(points, args.policies, args.seeds, args.results, args.workers, args.solver, args.stream)
+    print(parallel.format_table(rows, TABLE_COLUMNS))
+    if args.csv:
+        parallel.write_csv(rows, args.csv, TABLE_COLUMNS)
+
+
+if __name__ == "__main__":
+    run()